@@ -9,12 +9,23 @@ environmental changes.
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import wraps
 from types import MappingProxyType
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import appdaemon.plugins.hass.hassapi as hass
 
 if TYPE_CHECKING:
+    import datetime as dt
+    from collections.abc import Callable, Hashable, Iterator
+
     from climate import Climate
     from control import Control
     from lights import Lights
@@ -24,6 +35,9 @@ if TYPE_CHECKING:
 
     from appdaemon.apps.appdaemon.entity import Entity
 
+_snapshot = threading.local()  # states read during the current callback (per thread)
+_profile = threading.local()  # state reads and service calls of the current callback
+
 
 class IDs:
     """System and user IDs defined by Home Assistant when referencing state context."""
@@ -48,23 +62,475 @@ class IDs:
         return cls.get_name(id_value) == "System"
 
 
+class Settings:
+    """Typed in-memory copy of the UI settings, kept in sync by Control."""
+
+    _types = MappingProxyType(
+        {
+            "input_number": float,
+            "input_datetime": str,
+            "input_select": str,
+        },
+    )
+
+    def __init__(self, controller: App):
+        """Load every setting from Home Assistant once."""
+        self.controller = controller
+        self.values: dict[str, float | str] = {}
+        self.bed_time: dt.time | None = None
+        for domain in self._types:
+            for entity_id, state in self.controller.get_state(domain).items():
+                self.update(entity_id, state["state"])
+
+    def update(self, entity_id: str, value: str):
+        """Store the typed value of a setting (keeping the last valid value)."""
+        cast = self._types.get(self.controller.split_entity(entity_id)[0])
+        if cast is None:
+            return
+        try:
+            self.values[entity_id] = cast(value)
+        except (TypeError, ValueError):
+            if entity_id in self.values:
+                self.controller.log(
+                    f"Ignoring '{entity_id}' value '{value}', "
+                    f"keeping '{self.values[entity_id]}'",
+                    level="WARNING",
+                )
+            return
+        if entity_id == "input_datetime.bed_time":
+            self.bed_time = self.controller.parse_time(self.values[entity_id])
+
+    def get(self, entity_id: str) -> float | str | None:
+        """Get the typed value of a setting, loading it if not yet known.
+
+        Until a setting has a valid state its initial value is used (if any).
+        """
+        if entity_id not in self.values:
+            self.update(entity_id, self.controller.get_state(entity_id))
+        if entity_id not in self.values:
+            self.update(
+                entity_id,
+                self.controller.get_state(entity_id, attribute="initial"),
+            )
+        return self.values.get(entity_id)
+
+    @property
+    def sleep(self) -> bool:
+        """Check if the sleep climate settings apply (Sleep scene or after bed time)."""
+        return self.values.get("input_select.scene") == "Sleep" or (
+            self.bed_time is not None and self.controller.time() > self.bed_time
+        )
+
+
+class Commands:
+    """Per-device queue of outbound service calls, flushed once per scheduler tick.
+
+    Pending turn_on parameters are merged, power commands supersede each other and
+    repeated services replace earlier ones. Commands identical to one still in
+    flight (sent but not yet reflected in the device's state) are dropped. When
+    flushed, devices sharing a service and parameters are sent in a single call.
+    """
+
+    in_flight_timeout = 10
+
+    def __init__(self, controller: App):
+        """Prepare empty queues for the controller's devices."""
+        self.controller = controller
+        self.pending: dict[str, list[tuple[str, dict]]] = {}
+        self.in_flight: dict[str, dict[str, tuple[dict, float]]] = {}
+        self.monitored: set[str] = set()
+        self.flush_timer = None
+        self.plans = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def plan(self) -> Iterator[None]:
+        """Hold calls submitted within the block then flush them together on exit."""
+        with self.lock:
+            self.plans += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.plans -= 1
+                flush = self.plans == 0 and bool(self.pending)
+            if flush:
+                self.flush()
+
+    def submit(self, entity_id: str, service: str, **kwargs: dict):
+        """Queue a service call for an entity, coalescing it with pending calls."""
+        action = service.split("/", maxsplit=1)[1]
+        with self.lock:
+            commands = self.pending.get(entity_id, [])
+            if not commands and self.__in_flight(entity_id, service, kwargs):
+                if self.controller.logger.isEnabledFor(logging.DEBUG):
+                    self.controller.log(
+                        f"Dropping '{service}' for '{entity_id}' as it is in flight",
+                        level="DEBUG",
+                    )
+                return
+            if action == "turn_off":
+                commands = []
+            elif action == "turn_on":
+                commands = [
+                    command
+                    for command in commands
+                    if not command[0].endswith("/turn_off")
+                ]
+                if commands and commands[-1][0] == service:
+                    kwargs = {**commands.pop()[1], **kwargs}
+            else:
+                commands = [command for command in commands if command[0] != service]
+            commands.append((service, kwargs))
+            self.pending[entity_id] = commands
+            if self.flush_timer is None and not self.plans:
+                self.flush_timer = self.controller.run_in(self.flush, 0)
+
+    def discard(self, entity_id: str, action: str | None = None):
+        """Drop an entity's pending calls (optionally only those for one action)."""
+        with self.lock:
+            if action is None:
+                self.pending.pop(entity_id, None)
+            elif entity_id in self.pending:
+                self.pending[entity_id] = [
+                    command
+                    for command in self.pending[entity_id]
+                    if not command[0].endswith(f"/{action}")
+                ]
+
+    def requested(self, entity_id: str, action: str) -> bool:
+        """Check if an action is queued, or sent but not yet reflected in state."""
+        suffix = f"/{action}"
+        now = self.controller.get_now_ts()
+        with self.lock:
+            pending = self.pending.get(entity_id, ())
+            return any(service.endswith(suffix) for service, _ in pending) or any(
+                service.endswith(suffix) and now - sent < self.in_flight_timeout
+                for service, (_, sent) in self.in_flight.get(entity_id, {}).items()
+            )
+
+    def flush(self, **kwargs: dict):
+        """Send all pending calls, one call per service and parameters in each round.
+
+        Each device's calls are sent in order, so round n holds every device's nth
+        call and devices in a round with identical calls share a single call.
+        """
+        del kwargs
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flush_timer = None
+        now = self.controller.get_now_ts()
+        for entity_id in pending:
+            if entity_id not in self.monitored:
+                self.monitored.add(entity_id)
+                self.controller.listen_state(
+                    self.handle_state_reported,
+                    entity_id,
+                    attribute="all",
+                )
+        for round_number in range(max(map(len, pending.values()), default=0)):
+            calls: dict[tuple, tuple[str, dict, list[str]]] = {}
+            for entity_id, commands in pending.items():
+                if round_number >= len(commands):
+                    continue
+                service, parameters = commands[round_number]
+                try:
+                    key = (service, *sorted(parameters.items()))
+                    hash(key)
+                except TypeError:
+                    key = (service, entity_id)
+                calls.setdefault(key, (service, parameters, []))[2].append(entity_id)
+                self.in_flight.setdefault(entity_id, {})[service] = (parameters, now)
+            for service, parameters, entity_ids in calls.values():
+                self.controller.call_service(
+                    service,
+                    entity_id=entity_ids[0] if len(entity_ids) == 1 else entity_ids,
+                    **parameters,
+                )
+
+    def handle_state_reported(
+        self,
+        entity: str,
+        attribute: str,
+        old: dict,
+        new: dict,
+        **kwargs: dict,
+    ):
+        """Forget in flight calls once the device reports a new state."""
+        del attribute, old, new, kwargs
+        self.in_flight.pop(entity, None)
+
+    def __in_flight(self, entity_id: str, service: str, parameters: dict) -> bool:
+        """Check if an identical call was recently sent and is still unconfirmed."""
+        sent = self.in_flight.get(entity_id, {}).get(service)
+        return (
+            sent is not None
+            and sent[0] == parameters
+            and self.controller.get_now_ts() - sent[1] < self.in_flight_timeout
+        )
+
+
+class CallbackProfile:
+    """Rolling latency and call counts of a callback."""
+
+    window = 500  # number of most recent calls used for latency percentiles
+
+    def __init__(self):
+        """Start with no calls recorded."""
+        self.durations: deque[float] = deque(maxlen=self.window)
+        self.count = 0
+        self.state_reads = 0
+        self.service_calls = 0
+
+    def record(self, duration: float, state_reads: int, service_calls: int):
+        """Record a completed call of the callback."""
+        self.durations.append(duration)
+        self.count += 1
+        self.state_reads += state_reads
+        self.service_calls += service_calls
+
+    def summary(self) -> dict[str, float]:
+        """Get call counts and latency percentiles (in milliseconds)."""
+        durations = sorted(self.durations)
+
+        def percentile(fraction: float) -> float:
+            index = min(len(durations) - 1, int(fraction * len(durations)))
+            return round(durations[index] * 1000, 1) if durations else 0
+
+        return {
+            "count": self.count,
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": percentile(1),
+            "state_reads": round(self.state_reads / max(self.count, 1), 1),
+            "service_calls": round(self.service_calls / max(self.count, 1), 1),
+        }
+
+
 class App(hass.Hass):
     """Utility functions and methods for Home Assistant interaction."""
 
+    profile_log_count = 5  # number of slowest callbacks logged in each profile report
+
     def __init__(self, *args, **kwargs):
         """Extend with attribute definitions."""
         super().__init__(*args, **kwargs)
         self.constants = self.args
+        self.commands = Commands(self)
+        self.profiles: dict[str, CallbackProfile] = {}
+        self.profiles_lock = threading.Lock()
+        self.profiles_timer = None
 
     def initialize(self):
         """AppDaemon calls when app is ready."""
 
-    def get_setting(self, setting_name: str) -> int:
-        """Get UI input_number setting values."""
+    @contextmanager
+    def state_snapshot(self) -> Iterator[None]:
+        """Serve repeated state reads from memory until the outermost block exits."""
+        if getattr(_snapshot, "states", None) is not None:
+            yield
+            return
+        _snapshot.states = {}
+        _snapshot.derived = {}
+        try:
+            yield
+        finally:
+            _snapshot.states = None
+            _snapshot.derived = None
+
+    def invalidate_state(self, entity_id: str | list[str] | None):
+        """Drop entities from the state snapshot so the next read is fresh."""
+        states = getattr(_snapshot, "states", None)
+        if states is None or entity_id is None:
+            return
+        for entity in [entity_id] if isinstance(entity_id, str) else entity_id:
+            states.pop(entity, None)
+        _snapshot.derived.clear()
+
+    def snapshot_cached(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Compute a value derived from states once per state snapshot.
+
+        Derived values are dropped whenever a state is invalidated, so they are
+        never older than the states they were computed from.
+        """
+        derived = getattr(_snapshot, "derived", None)
+        if derived is None:
+            return compute()
+        if key not in derived:
+            derived[key] = compute()
+        return derived[key]
+
+    def get_state(
+        self,
+        entity_id: str | None = None,
+        attribute: str | None = None,
+        default: str | float | None = None,
+        **kwargs: dict,
+    ):
+        """Extend to serve repeated reads of an entity from the state snapshot."""
+        counts = getattr(_profile, "counts", None)
+        if counts is not None:
+            counts[0] += 1
+        states = getattr(_snapshot, "states", None)
+        if states is None or kwargs or entity_id is None or "." not in entity_id:
+            return super().get_state(
+                entity_id,
+                attribute=attribute,
+                default=default,
+                **kwargs,
+            )
+        entity_states = states.setdefault(entity_id, {})
+        if attribute not in entity_states:
+            entity_states[attribute] = super().get_state(
+                entity_id,
+                attribute=attribute,
+            )
+        value = entity_states[attribute]
+        return default if value is None else value
+
+    def get_float_state(self, entity_id: str, attribute: str | None = None) -> float:
+        """Get an entity's state (or attribute) as a float, parsed once per snapshot."""
+        states = getattr(_snapshot, "states", None)
+        if states is None:
+            return float(self.get_state(entity_id, attribute=attribute))
+        key = (attribute, float)
+        entity_states = states.get(entity_id, {})
+        if key not in entity_states:
+            value = float(self.get_state(entity_id, attribute=attribute))
+            states.setdefault(entity_id, {})[key] = value
+            return value
+        return entity_states[key]
+
+    def call_service(self, service: str, **kwargs: dict):
+        """Extend to refresh targeted entities in the state snapshot on next read."""
+        counts = getattr(_profile, "counts", None)
+        if counts is not None:
+            counts[1] += 1
+        self.invalidate_state(kwargs.get("entity_id"))
+        return super().call_service(service, **kwargs)
+
+    def listen_state(self, callback: Callable, *args, **kwargs: dict):
+        """Extend to run the callback within a state snapshot (if enabled)."""
+        return super().listen_state(
+            self.__wrap_callback(callback, state_callback=True),
+            *args,
+            **kwargs,
+        )
+
+    def listen_event(self, callback: Callable, *args, **kwargs: dict):
+        """Extend to run the callback within a state snapshot (if enabled)."""
+        return super().listen_event(self.__wrap_callback(callback), *args, **kwargs)
+
+    def run_in(self, callback: Callable, *args, **kwargs: dict):
+        """Extend to run the callback within a state snapshot (if enabled)."""
+        return super().run_in(self.__wrap_callback(callback), *args, **kwargs)
+
+    def run_every(self, callback: Callable, *args, **kwargs: dict):
+        """Extend to run the callback within a state snapshot (if enabled)."""
+        return super().run_every(self.__wrap_callback(callback), *args, **kwargs)
+
+    def run_daily(self, callback: Callable, *args, **kwargs: dict):
+        """Extend to run the callback within a state snapshot (if enabled)."""
+        return super().run_daily(self.__wrap_callback(callback), *args, **kwargs)
+
+    def __wrap_callback(
+        self,
+        callback: Callable,
+        *,
+        state_callback: bool = False,
+    ) -> Callable:
+        """Wrap a callback to use a state snapshot and/or profile it (if enabled)."""
+        snapshot = self.constants.get("state_snapshot")
+        profile = self.constants.get("profile_callbacks")
+        if not (snapshot or profile) or asyncio.iscoroutinefunction(callback):
+            return callback
+        if profile:
+            self.__start_profile_reports()
+
+        @wraps(callback)
+        def wrapper(*args, **kwargs):
+            if not profile:
+                return self.__run_callback(callback, args, kwargs, state_callback)
+            outer_counts = getattr(_profile, "counts", None)
+            _profile.counts = counts = [0, 0]
+            start = time.perf_counter()
+            try:
+                return self.__run_callback(callback, args, kwargs, state_callback)
+            finally:
+                duration = time.perf_counter() - start
+                _profile.counts = outer_counts
+                if outer_counts is not None:
+                    outer_counts[0] += counts[0]
+                    outer_counts[1] += counts[1]
+                with self.profiles_lock:
+                    self.profiles.setdefault(
+                        callback.__qualname__,
+                        CallbackProfile(),
+                    ).record(duration, *counts)
+
+        return wrapper
+
+    def __run_callback(
+        self,
+        callback: Callable,
+        args: tuple,
+        kwargs: dict,
+        state_callback: bool,
+    ):
+        """Run a callback (within a state snapshot if enabled)."""
+        if not self.constants.get("state_snapshot"):
+            return callback(*args, **kwargs)
+        if state_callback:
+            self.invalidate_state(args[0])
+        with self.state_snapshot():
+            return callback(*args, **kwargs)
+
+    def __start_profile_reports(self):
+        """Periodically report callback profiles (once the first is registered)."""
+        if self.profiles_timer is not None:
+            return
+        period = self.constants["profile_callbacks"]
+        self.profiles_timer = super().run_every(
+            self.report_callback_profiles,
+            self.datetime() + timedelta(seconds=period),
+            period,
+        )
+
+    def report_callback_profiles(self, **kwargs: dict):
+        """Log the slowest callbacks and publish all profiles as a sensor."""
+        del kwargs
+        with self.profiles_lock:
+            summaries = {
+                name: profile.summary() for name, profile in self.profiles.items()
+            }
+        slowest = sorted(
+            summaries.items(),
+            key=lambda item: item[1]["p95"],
+            reverse=True,
+        )
+        for name, summary in slowest[: self.profile_log_count]:
+            self.log(
+                f"{name}: {summary['count']} calls, "
+                f"p50/p95/p99 {summary['p50']}/{summary['p95']}/{summary['p99']} ms, "
+                f"{summary['state_reads']} state reads and "
+                f"{summary['service_calls']} service calls per call",
+            )
+        self.set_state(
+            f"sensor.{self.name.lower()}_callback_profile",
+            state=sum(summary["count"] for summary in summaries.values()),
+            attributes={
+                "unit_of_measurement": "calls",
+                "friendly_name": f"{self.name} Callback Profile",
+                **summaries,
+            },
+        )
+
+    def get_setting(self, setting_name: str) -> int | str:
+        """Get UI input_number (or input_datetime) setting values."""
         if setting_name.endswith("_time"):
-            return self.get_state(f"input_datetime.{setting_name}")
-        return int(float(self.get_state(f"input_number.{setting_name}")))
-        # TODO: detect more types
+            return self.control.settings.get(f"input_datetime.{setting_name}")
+        return int(self.control.settings.get(f"input_number.{setting_name}"))
 
     def cancel_timer(self, handle):
         """Cancel timer or ignore if it is invalid or has already triggered."""
@@ -186,7 +652,7 @@ class Device:
     @property
     def on(self) -> bool:
         """Check if the device is currently on or not."""
-        return self.device.state != "off"
+        return self.controller.get_state(self.device_id) != "off"
 
     @property
     def control_enabled(self) -> bool:
@@ -217,32 +683,39 @@ class Device:
         del check_if_would_adjust_only
         return False
 
+    @property
+    def power_domain(self) -> str:
+        """Domain of the services that turn the device (or group) on and off."""
+        return self.device_type if self.device_type != "group" else "homeassistant"
+
     def turn_on(self, **kwargs: dict):
         """Turn the device on if it's off or adjust with provided parameters."""
         if not self.on or kwargs:
-            if self.device_type != "group":
-                self.device.turn_on(**kwargs)
-            else:
-                self.controller.call_service(
-                    "homeassistant/turn_on",
-                    entity_id=self.device_id,
-                    **kwargs,
-                )
+            self.controller.commands.submit(
+                self.device_id,
+                f"{self.power_domain}/turn_on",
+                **kwargs,
+            )
+        else:
+            self.controller.commands.discard(self.device_id, "turn_off")
 
     def turn_off(self):
         """Turn the device off if it's on."""
         if self.on:
-            if self.device_type != "group":
-                self.device.turn_off()
-            else:
-                self.controller.call_service(
-                    "homeassistant/turn_off",
-                    entity_id=self.device_id,
-                )
+            self.controller.commands.submit(
+                self.device_id,
+                f"{self.power_domain}/turn_off",
+            )
+        else:
+            self.controller.commands.discard(self.device_id)
 
     def call_service(self, service: str, **kwargs: dict):
         """Call one of the device's services in Home Assistant."""
-        self.device.call_service(service, **kwargs)
+        self.controller.commands.submit(
+            self.device_id,
+            f"{self.device_type}/{service}",
+            **kwargs,
+        )
 
     def get_attribute(
         self,
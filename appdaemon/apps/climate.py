@@ -13,14 +13,23 @@ User defined variables are configued in climate.yaml
 # TODO: rearrange all properties and methods more logically
 from __future__ import annotations
 
+import datetime as dt
+import heapq
 import logging
-from math import ceil
+import threading
+from bisect import bisect_left, bisect_right
+from math import ceil, inf, isnan, nan
 from typing import TYPE_CHECKING
 
 from app import App, Device
+from decisions import Decisions, Inputs, decide
 from presence import PresenceDevice
+from tariff import Optimizer, Tariff, aircon_power
+from thermal import History, RoomHistory, ThermalModel
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
     from appdaemon.entity import Entity
 
 
@@ -35,6 +44,10 @@ class Climate(App):
         self.heaters: dict[str, Heater] = {}
         self.fans: dict[str, Fan] = {}
         self.humidifiers: dict[str, Humidifier] = {}
+        self.dependents: dict[str, list[ClimateDevice]] = {}
+        self.adjustments: AdjustmentScheduler | None = None
+        self.readings = RoomReadings(self)
+        self.pre_conditioner: PreConditioner | None = None
 
     def initialize(self):
         """Initialise TemperatureMonitor, Aircon units, and event listening.
@@ -100,25 +113,56 @@ class Climate(App):
                 room="bedroom",
             ),
         }
-        for device_group in (self.aircons, self.fans, self.heaters, self.humidifiers):
-            for device in device_group.values():
-                device.monitor_presence()
-                device.adjust_for_conditions()
-        for temperatures in ("weighted_average_inside", "outside"):
-            self.listen_state(
-                self.handle_temperature_change,
-                f"sensor.{temperatures}_apparent_temperature",
+        self.adjustments = AdjustmentScheduler(
+            self,
+            self.constants.get("adjustment_debounce", {}),
+        )
+        for device in self.devices:
+            device.monitor_presence()
+        self.evaluate(self.devices)
+        for device in self.devices:
+            for dependency in device.dependencies:
+                self.dependents.setdefault(dependency, []).append(device)
+        for entity_id in {*self.dependents, *self.readings.indexes}:
+            if entity_id.startswith("sensor."):
+                self.listen_state(self.handle_sensor_change, entity_id)
+        self.listen_state(
+            self.handle_temperature_change,
+            "sensor.weighted_average_inside_apparent_temperature",
+        )
+        if "thermal_model_history_days" in self.constants:
+            self.run_in(self.fit_thermal_models, 0)
+            self.run_daily(self.fit_thermal_models, "03:30:00")
+        if "pre_conditioning" in self.constants:
+            self.pre_conditioner = PreConditioner(self)
+            self.run_every(
+                self.pre_conditioner.plan,
+                "now+10",
+                self.constants["pre_conditioning_period"],
             )
 
+    @property
+    def devices(self) -> list[ClimateDevice]:
+        """Get all aircons, fans, heaters and humidifiers."""
+        return [
+            device
+            for devices in (self.aircons, self.fans, self.heaters, self.humidifiers)
+            for device in devices.values()
+        ]
+
+    def get_device(self, device_id: str) -> ClimateDevice:
+        """Get an aircon, fan, heater or humidifier by its entity id."""
+        return next(device for device in self.devices if device.device_id == device_id)
+
     @property
     def any_climate_control_enabled(self) -> bool:
         """Get climate control setting that has been synced to Home Assistant."""
-        return self.entities.group.any_climate_control.state == "on"
+        return self.get_state("group.any_climate_control") == "on"
 
     @property
     def all_climate_control_enabled(self) -> bool:
         """Get climate control setting that has been synced to Home Assistant."""
-        return self.entities.group.any_climate_control.state == "on"
+        return self.get_state("group.any_climate_control") == "on"
 
     @all_climate_control_enabled.setter
     def all_climate_control_enabled(self, enable: bool):
@@ -134,12 +178,12 @@ class Climate(App):
     @property
     def any_aircon_on(self) -> bool:
         """Get aircon setting that has been synced to Home Assistant."""
-        return self.entities.group.any_aircon.state != "off"
+        return self.get_state("group.any_aircon") != "off"
 
     @property
     def all_aircon_on(self) -> bool:
         """Get aircon setting that has been synced to Home Assistant."""
-        return self.entities.group.all_aircon.state != "off"
+        return self.get_state("group.all_aircon") != "off"
 
     @all_aircon_on.setter
     def all_aircon_on(self, on: bool) -> bool:
@@ -159,9 +203,9 @@ class Climate(App):
 
     def get_setting(self, setting_name: str) -> float:
         """Get temperature target and trigger settings, accounting for Sleep scene."""
-        if self.control.scene == "Sleep" or self.control.bed_time:
+        if self.control.settings.sleep:
             setting_name = f"sleep_{setting_name}"
-        return float(self.get_state(f"input_number.{setting_name}"))
+        return self.control.settings.get(f"input_number.{setting_name}")
 
     def update_door_check_delay(self, seconds: float):
         """Update the delay before registering a door as open for each aircon."""
@@ -207,9 +251,92 @@ class Climate(App):
     def adjust_for_conditions(self):
         """Control aircon or suggest based on changes in inside temperature."""
         """Handle each case (house open, outside nicer, climate control status)?"""
-        for device_group in (self.aircons, self.fans, self.heaters, self.humidifiers):
-            for device in device_group.values():
-                device.adjust_for_conditions()
+        self.evaluate(self.devices)
+        self.suggest_if_too_hot_or_cold_for_pets()
+
+    def adjust_dependents(self, entity_id: str):
+        """Adjust only the devices that depend on the given sensor or setting."""
+        self.evaluate(self.dependents.get(entity_id, ()))
+
+    def fit_thermal_models(self, **kwargs: dict):
+        """Fit each aircon and heater room's thermal model from recorded history."""
+        del kwargs
+        days = self.constants["thermal_model_history_days"]
+        end = self.get_now_ts()
+        start = end - days * 86400
+        histories: dict[str, History] = {}
+
+        def history(entity_id: str) -> History:
+            if entity_id not in histories:
+                changes = self.get_history(entity_id=entity_id, days=days) or [[]]
+                histories[entity_id] = History(changes[0] if changes else [])
+            return histories[entity_id]
+
+        for device in (*self.aircons.values(), *self.heaters.values()):
+            model = ThermalModel()
+            if model.fit_history(
+                RoomHistory(
+                    temperatures=[
+                        history(sensor.entity_id)
+                        for sensor in device.temperature_sensors
+                    ],
+                    outside=history("sensor.outside_apparent_temperature"),
+                    device=history(device.device_id),
+                    doors=[history(door.entity_id) for door in device.doors],
+                ),
+                start,
+                end,
+                self.constants["thermal_model_sample_period"],
+            ):
+                device.thermal_model = model
+            self.publish_thermal_model(device.room, model)
+
+    def publish_thermal_model(self, room: str, model: ThermalModel):
+        """Publish a room's fitted thermal model, with coefficients per hour."""
+        self.set_state(
+            f"sensor.{room}_thermal_model",
+            state=round(1 / model.coefficients["loss"] / 3600, 1)
+            if model.ready
+            else "unavailable",
+            attributes={
+                "friendly_name": f"{room.replace('_', ' ').title()} Thermal Model",
+                "unit_of_measurement": "h",
+                "samples": model.samples,
+                "rmse_per_hour": round(model.rmse * 3600, 3)
+                if model.rmse is not None
+                else None,
+                **{
+                    f"{name}_per_hour": round(value * 3600, 4)
+                    for name, value in model.coefficients.items()
+                },
+            },
+        )
+
+    def energy_tariff(self) -> Tariff:
+        """Get the time-of-use tariff, with rates from entities' current states.
+
+        Rates can be numbers or entity ids (such as provider_rates.yaml's inputs).
+        Periods whose rate is unavailable fall back to the base rate.
+        """
+        config = self.constants.get("tariff", {})
+
+        def rate(value: float | str) -> float | None:
+            try:
+                return float(self.get_state(value) if isinstance(value, str) else value)
+            except (TypeError, ValueError):
+                return None
+
+        return Tariff(
+            [
+                {**period, "rate": rate(period["rate"])}
+                for period in config.get("periods", [])
+            ],
+            rate(config.get("base_rate", 0)) or 0.0,
+            self.get_tz_offset(),
+        )
+
+    def suggest_if_too_hot_or_cold_for_pets(self):
+        """Suggest turning aircon on if the pets are home alone and it isn't on."""
         if (
             self.presence.pets_home_alone
             and not self.any_aircon_on
@@ -323,11 +450,11 @@ class Climate(App):
                 "ing_target_temperature"
             )
             modifier = -1 if "low" in target_or_trigger else 1
+        settings = self.control.settings
         if (
-            float(self.get_state(f"input_number.{target_or_trigger}"))
-            - float(self.get_state(other))
+            settings.get(f"input_number.{target_or_trigger}") - settings.get(other)
         ) * modifier < 0:
-            valid_other = float(self.get_state(f"input_number.{target_or_trigger}"))
+            valid_other = settings.get(f"input_number.{target_or_trigger}")
             self.call_service(
                 "input_number/set_value",
                 entity_id=other,
@@ -339,30 +466,101 @@ class Climate(App):
                 level="WARNING",
             )
         self.allow_suggestion()
-        self.adjust_for_conditions()
+        self.adjust_dependents(f"input_number.{target_or_trigger}")
 
     def terminate(self):
         """Cancel presence callbacks before termination????
 
         Appdaemon defined function called before termination.
         """
-        for device_group in (self.aircons, self.fans, self.heaters, self.humidifiers):
-            for device in device_group.values():
-                device.ignore_vacancy()
+        for device in self.devices:
+            device.ignore_vacancy()
+
+    def decision_inputs(self) -> Inputs:
+        """Get the inputs shared by every room's decisions, once per state snapshot.
+
+        The temperature is left unknown (NaN) to be filled in for each room.
+        """
+        return self.snapshot_cached(
+            ("climate_inputs",),
+            lambda: Inputs(
+                temperature=nan,
+                outside=self.outside_temperature_reading,
+                cooling_target=self.get_setting("cooling_target_temperature"),
+                heating_target=self.get_setting("heating_target_temperature"),
+                low_trigger=self.get_setting("low_temperature_aircon_trigger"),
+                high_trigger=self.get_setting("high_temperature_aircon_trigger"),
+                inside_outside_trigger=self.constants["inside_outside_trigger"],
+                unattended="Away" in self.control.scene
+                and not self.presence.pets_home_alone,
+            ),
+        )
+
+    def room_decisions(
+        self,
+        rooms: tuple[str, ...],
+        temperature: Callable[[], float],
+    ) -> Decisions:
+        """Get the climate decisions for rooms' temperature, once per state snapshot.
+
+        Devices covering the same rooms share the decisions.
+        """
+        return self.snapshot_cached(
+            ("climate_decisions", rooms),
+            lambda: decide(self.decision_inputs()._replace(temperature=temperature())),
+        )
+
+    def evaluate(self, devices: Iterable[ClimateDevice]):
+        """Decide for all of the devices' rooms in one pass, then adjust each device.
+
+        The shared inputs are read once and each distinct group of rooms is
+        decided once from its shared readings, with the decisions handed to
+        every device covering those rooms for the rest of the pass.
+        """
+        devices = list(devices)
+        inputs = self.decision_inputs()
+        decided: dict[tuple[str, ...], Decisions] = {}
+        for device in devices:
+            if device.temperature_readings is None:
+                continue
+            if device.all_rooms not in decided:
+                decided[device.all_rooms] = decide(
+                    inputs._replace(
+                        temperature=self.readings.average(device.temperature_readings),
+                    ),
+                )
+            device.evaluated = decided[device.all_rooms]
+        try:
+            for device in devices:
+                device.adjust_for_conditions()
+        finally:
+            for device in devices:
+                device.evaluated = None
+
+    @property
+    def decisions(self) -> Decisions:
+        """Get the climate decisions for the inside temperature."""
+        return self.room_decisions(("inside",), lambda: self.inside_temperature)
 
-    # TODO: consider making a TemperatureChecker class with all the following checks
-    # devices can use with their own temperature
     @property
     def inside_temperature(self) -> float:
         """Get the calculated inside temperature that's synced with Home Assistant."""
-        return float(
-            self.entities.sensor.weighted_average_inside_apparent_temperature.state,
+        return self.get_float_state(
+            "sensor.weighted_average_inside_apparent_temperature",
         )
 
     @property
     def outside_temperature(self) -> float:
         """Get the calculated outside temperature from Home Assistant."""
-        return float(self.entities.sensor.outside_apparent_temperature.state)
+        return self.get_float_state("sensor.outside_apparent_temperature")
+
+    @property
+    def outside_temperature_reading(self) -> float:
+        """Get the outside temperature, or NaN while the sensor is unavailable."""
+        try:
+            return self.outside_temperature
+        except (TypeError, ValueError):
+            return nan
 
     def handle_temperature_change(
         self,
@@ -372,92 +570,424 @@ class Climate(App):
         new: float,
         **kwargs: dict,
     ):
-        """Calculate inside temperature then get controller to handle if changed."""
+        """Check if the pets need aircon when the inside temperature changes."""
         del entity, attribute, old, kwargs
         if new not in (None, "unavailable", "unknown"):
             # TODO: https://app.asana.com/0/1207020279479204/1207217352886591/f
             # be more resilient towards unavailable/unknown temperatures
-            self.adjust_for_conditions()
+            self.suggest_if_too_hot_or_cold_for_pets()
+
+    def handle_sensor_change(
+        self,
+        entity: str,
+        attribute: str,
+        old: float,
+        new: float,
+        **kwargs: dict,
+    ):
+        """Record the reading and schedule re-evaluation of dependent devices."""
+        del attribute, old, kwargs
+        self.readings.update(entity, new)
+        if new in (None, "unavailable", "unknown"):
+            return
+        for device in self.dependents.get(entity, ()):
+            self.adjustments.request(device)
 
     @property
     def within_target_temperatures(self) -> bool:
         """Check if temperature is not above or below target temperatures."""
-        return not (self.above_target_temperature or self.below_target_temperature)
+        return self.decisions.within_target_temperatures
 
     @property
     def above_target_temperature(self) -> bool:
         """Check if temperature is above the target temperature."""
-        return self.inside_temperature > self.get_setting("cooling_target_temperature")
+        return self.decisions.above_target_temperature
 
     @property
     def below_target_temperature(self) -> bool:
         """Check if temperature is below the target temperature."""
-        return self.inside_temperature < self.get_setting("heating_target_temperature")
+        return self.decisions.below_target_temperature
 
     @property
     def hotter_outside(self) -> bool:
         """Check if temperature is higher outside than inside."""
-        return (
-            self.inside_temperature
-            < self.outside_temperature - self.constants["inside_outside_trigger"]
-        )
+        return self.decisions.hotter_outside
 
     @property
     def colder_outside(self) -> bool:
         """Check if temperature is lower outside than inside."""
-        return (
-            self.inside_temperature
-            > self.outside_temperature + self.constants["inside_outside_trigger"]
-        )
+        return self.decisions.colder_outside
 
     @property
     def too_hot_or_cold_outside(self) -> bool:
         """Check if outside temperature exceeds desired indoor thresholds."""
-        return not (
-            self.get_setting("low_temperature_aircon_trigger")
-            <= self.outside_temperature
-            <= self.get_setting("high_temperature_aircon_trigger")
-        )
+        return self.decisions.too_hot_or_cold_outside
 
     @property
     def outside_temperature_nicer(self) -> bool:
         """Check if outside is a nicer temperature than inside."""
-        mode = self.entities.climate.bedroom_aircon.state
+        mode = self.get_state("climate.bedroom_aircon")
         # TODO: use aircon group state instead?
-        return any(
-            (
-                mode == "heat" and self.hotter_outside,
-                mode == "cool" and self.colder_outside,
-                mode == "off"
-                and (self.too_hot_or_cold and not self.too_hot_or_cold_outside),
-            ),
-        )
+        return self.decisions.outside_temperature_nicer(mode)
 
     @property
     def too_hot_or_cold(self) -> bool:
         """Check if temperature inside is above or below the max/min triggers."""
-        return not (
-            self.get_setting("low_temperature_aircon_trigger")
-            < self.inside_temperature
-            < self.get_setting("high_temperature_aircon_trigger")
-        )
+        return self.decisions.too_hot_or_cold
 
     @property
     def closer_to_hot_than_cold(self) -> bool:
         """Return if temperature inside is closer to needing cooling than heating."""
-        return (
-            self.inside_temperature
-            > (
-                self.get_setting("cooling_target_temperature")
-                + self.get_setting("heating_target_temperature")
+        return self.decisions.closer_to_hot_than_cold
+
+
+class RoomReadings:
+    """Latest room sensor readings, averaged over each device's (linked) rooms.
+
+    Every sensor's reading is held once in a list, updated from its state
+    changes, and each group of sensors a device averages is indexed into it.
+    A change costs one assignment plus dropping the cached averages of the
+    groups including the sensor, and an average is only recomputed when next
+    read, so the cost per event stays flat as rooms and devices are added.
+    Unavailable sensors (NaN) are left out of averages, which are only unknown
+    (NaN) once all of a group's sensors are unavailable.
+    """
+
+    def __init__(self, controller: Climate):
+        """Start without any sensors."""
+        self.controller = controller
+        self.indexes: dict[str, int] = {}
+        self.values: list[float] = []
+        self.groups: dict[tuple[str, ...], tuple[int, ...]] = {}
+        self.sensor_groups: list[list[tuple[str, ...]]] = []
+        self.averages: dict[tuple[str, ...], float] = {}
+
+    def group(self, entity_ids: Iterable[str]) -> tuple[str, ...]:
+        """Track sensors averaged together, returning the group's key."""
+        key = tuple(entity_ids)
+        if key not in self.groups:
+            for entity_id in key:
+                if entity_id not in self.indexes:
+                    self.indexes[entity_id] = len(self.values)
+                    self.values.append(nan)
+                    self.sensor_groups.append([])
+                    self.update(entity_id, self.controller.get_state(entity_id))
+            self.groups[key] = tuple(self.indexes[entity_id] for entity_id in key)
+            for index in set(self.groups[key]):
+                self.sensor_groups[index].append(key)
+        return key
+
+    def update(self, entity_id: str, value: str | float | None):
+        """Record a sensor's new reading (NaN if it isn't a number)."""
+        index = self.indexes.get(entity_id)
+        if index is None:
+            return
+        try:
+            reading = float(value)
+        except (TypeError, ValueError):
+            reading = nan
+            if not isnan(self.values[index]):
+                self.controller.log(f"'{entity_id}' is '{value}'", level="WARNING")
+        self.values[index] = reading
+        for key in self.sensor_groups[index]:
+            self.averages.pop(key, None)
+
+    def average(self, key: tuple[str, ...]) -> float:
+        """Get the average reading of a group of sensors."""
+        average = self.averages.get(key)
+        if average is None:
+            readings = [
+                self.values[index]
+                for index in self.groups[key]
+                if not isnan(self.values[index])
+            ]
+            average = sum(readings) / len(readings) if readings else nan
+            self.averages[key] = average
+        return average
+
+
+class AdjustmentScheduler:
+    """Debounce device re-evaluations on sensor changes from one deadline heap.
+
+    A change schedules its device's evaluation after its type's coalesce period
+    (and at least min_interval after its previous scheduled evaluation), with
+    any further changes before then collapsing into that one trailing
+    evaluation. A single timer is kept for the earliest deadline.
+    """
+
+    def __init__(self, controller: Climate, debounce: dict[str, dict]):
+        """Prepare with (min_interval, coalesce) seconds per device type name."""
+        self.controller = controller
+        self.debounce = {
+            device_type: (
+                settings.get("min_interval", 0),
+                settings.get("coalesce", 0),
+            )
+            for device_type, settings in debounce.items()
+        }
+        self.heap: list[tuple[float, int, ClimateDevice]] = []
+        self.deadlines: dict[ClimateDevice, float] = {}
+        self.last_adjusted: dict[ClimateDevice, float] = {}
+        self.sequence = 0
+        self.timer = None
+        self.timer_deadline = inf
+        self.lock = threading.Lock()
+
+    def request(self, device: ClimateDevice):
+        """Schedule a device's evaluation (unless one is already pending)."""
+        now = self.controller.get_now_ts()
+        min_interval, coalesce = self.debounce.get(type(device).__name__, (0, 0))
+        with self.lock:
+            if device in self.deadlines:
+                return
+            deadline = max(
+                now + coalesce,
+                self.last_adjusted.get(device, -inf) + min_interval,
             )
-            / 2
+            self.deadlines[device] = deadline
+            self.sequence += 1
+            heapq.heappush(self.heap, (deadline, self.sequence, device))
+            self.__schedule(now)
+
+    def __schedule(self, now: float):
+        """Keep the timer set for the earliest deadline (lock must be held)."""
+        if not self.heap or self.heap[0][0] >= self.timer_deadline:
+            return
+        if self.timer is not None:
+            self.controller.cancel_timer(self.timer)
+        self.timer_deadline = self.heap[0][0]
+        self.timer = self.controller.run_in(
+            self.adjust_due,
+            max(0, self.timer_deadline - now),
         )
 
+    def adjust_due(self, **kwargs: dict):
+        """Evaluate every device whose deadline has passed, then re-arm the timer."""
+        del kwargs
+        now = self.controller.get_now_ts()
+        due = []
+        with self.lock:
+            self.timer, self.timer_deadline = None, inf
+            while self.heap and self.heap[0][0] <= now:
+                _, _, device = heapq.heappop(self.heap)
+                del self.deadlines[device]
+                if device.control_enabled:
+                    self.last_adjusted[device] = now
+                    due.append(device)
+            self.__schedule(now)
+        self.controller.evaluate(due)
+
+
+class PreConditioner:
+    """Book runs that bring rooms to target by Control's bed/nursery/morning times.
+
+    Using the hourly weather forecast and each device's thermal model, the room
+    temperature is predicted up to the time. If it would be outside the targets
+    then, the run reaching the target that costs least under the energy tariff
+    is found (see tariff.Optimizer) and its start is booked as a timer. Plans
+    are refreshed as the forecast updates, and the cost of started runs is
+    totalled against running each right up to its time.
+    """
+
+    def __init__(self, controller: Climate):
+        """Prepare to plan for the devices configured against each time."""
+        self.controller = controller
+        self.timers: dict[str, str] = {}
+        self.plans: dict[str, dict] = {}
+        self.cost = 0.0
+        self.savings = 0.0
+
+    def forecast(self) -> tuple[list[float], list[float]]:
+        """Get hourly forecast (start timestamps, apparent temperatures)."""
+        entity_id = self.controller.constants["weather_entity"]
+        response = self.controller.call_service(
+            "weather/get_forecasts",
+            entity_id=entity_id,
+            type="hourly",
+            return_result=True,
+        )
+        if isinstance(response, dict):
+            response = response.get("result", response)
+            response = response.get("response", response)
+        try:
+            hours = response[entity_id]["forecast"]
+        except (KeyError, TypeError):
+            return [], []
+        times, temperatures = [], []
+        for hour in hours:
+            temperature = hour.get("apparent_temperature", hour.get("temperature"))
+            if temperature is not None:
+                times.append(
+                    dt.datetime.fromisoformat(hour["datetime"]).timestamp(),
+                )
+                temperatures.append(float(temperature))
+        return times, temperatures
+
+    def seconds_until(self, time_name: str) -> float:
+        """Get seconds until the next occurrence of one of Control's times."""
+        controller = self.controller
+        now = controller.datetime()
+        at = dt.datetime.combine(
+            now.date(),
+            controller.parse_time(controller.control.get_setting(time_name)),
+        )
+        if at <= now:
+            at += dt.timedelta(days=1)
+        return (at - now).total_seconds()
+
+    def plan(self, **kwargs: dict):
+        """Re-plan pre-conditioning runs from the latest forecast."""
+        del kwargs
+        controller = self.controller
+        times, temperatures = self.forecast()
+        if not times:
+            controller.log("No hourly forecast, not pre-conditioning", level="DEBUG")
+            return
+        now = controller.get_now_ts()
+
+        def outside_at(timestamp: float) -> float:
+            index = bisect_right(times, timestamp) - 1
+            if index >= 0:
+                return temperatures[index]
+            try:
+                return controller.outside_temperature
+            except (TypeError, ValueError):
+                return temperatures[0]
+
+        tariff = controller.energy_tariff()
+        for time_name, device_ids in controller.constants["pre_conditioning"].items():
+            deadline = now + self.seconds_until(time_name)
+            for device_id in device_ids:
+                device = controller.get_device(device_id)
+                if device.pre_conditioning or device.thermal_model is None:
+                    continue
+                controller.cancel_timer(self.timers.pop(device_id, None))
+                plan = self.plan_device(
+                    device,
+                    Optimizer(
+                        device.thermal_model,
+                        tariff,
+                        device.room_temperature,
+                        now=now,
+                        deadline=deadline,
+                        earliest=deadline
+                        - controller.constants["pre_conditioning_max_lead"],
+                        step=controller.constants["pre_conditioning_step"],
+                        boundaries=times,
+                        outside_at=outside_at,
+                    ),
+                    sleep=time_name != "morning_time",
+                )
+                self.plans[device_id] = {"time": time_name, **plan}
+                if "start" in plan:
+                    self.timers[device_id] = controller.run_in(
+                        self.start,
+                        plan["start"] - now,
+                        device_id=device_id,
+                    )
+        self.publish()
+
+    def publish(self):
+        """Publish the planned runs and the cost of those started so far."""
+        self.controller.set_state(
+            "sensor.pre_conditioning",
+            state=sum("start" in plan for plan in self.plans.values()),
+            attributes={
+                "friendly_name": "Pre-conditioning Runs",
+                "cost": round(self.cost, 4),
+                "savings": round(self.savings, 4),
+                "plans": {
+                    device_id: {
+                        key: dt.datetime.fromtimestamp(
+                            value,
+                            dt.UTC,
+                        ).isoformat()
+                        if key in ("start", "end", "deadline")
+                        else value
+                        for key, value in plan.items()
+                    }
+                    for device_id, plan in self.plans.items()
+                },
+            },
+        )
+
+    def plan_device(
+        self,
+        device: ClimateDevice,
+        optimizer: Optimizer,
+        *,
+        sleep: bool,
+    ) -> dict:
+        """Find the cheapest run that has the room at target by the deadline.
+
+        The run may end before the deadline and let the room coast, but must not
+        take it past the opposite (low or high) aircon trigger on the way.
+        """
+        settings = self.controller.control.settings
+        prefix = "input_number.sleep_" if sleep else "input_number."
+        deadline = optimizer.starts[-1]
+        passive = optimizer.simulate(deadline, deadline)
+        if (
+            passive.predicted > settings.get(f"{prefix}cooling_target_temperature")
+            and isinstance(device, Aircon)
+        ):
+            mode, limit = "cool", f"{prefix}low_temperature_aircon_trigger"
+        elif passive.predicted < settings.get(f"{prefix}heating_target_temperature"):
+            mode, limit = "heat", f"{prefix}high_temperature_aircon_trigger"
+        else:
+            return {"deadline": deadline, "predicted": round(passive.predicted, 1)}
+        target = settings.get(f"{prefix}{mode}ing_target_temperature")
+        run, latest = optimizer.cheapest(
+            mode,
+            target,
+            settings.get(limit),
+            lambda temperature: device.estimated_power(abs(temperature - target)),
+        )
+        return {
+            "start": run.start,
+            "end": run.end,
+            "deadline": deadline,
+            "mode": mode,
+            "target": target,
+            "predicted": round(run.predicted, 1),
+            "cost": round(run.cost, 4),
+            "savings": round(latest.cost - run.cost, 4),
+        }
+
+    def start(self, **kwargs: dict):
+        """Start a booked pre-conditioning run, keeping the device on until it ends."""
+        self.timers.pop(kwargs["device_id"], None)
+        device = self.controller.get_device(kwargs["device_id"])
+        if not device.control_enabled:
+            return
+        plan = self.plans[kwargs["device_id"]]
+        self.controller.log(
+            f"Pre-conditioning the {device.room} with the "
+            f"{device.device.friendly_name.lower()}",
+        )
+        device.pre_conditioning_until = plan["end"]
+        device.pre_conditioning_mode = plan["mode"]
+        device.pre_conditioning_target = plan["target"]
+        device.turn_on_for_conditions()
+        self.cost += plan["cost"]
+        self.savings += plan["savings"]
+        self.publish()
+
 
 class ClimateDevice(Device):
     """Climate device that can be configured to respond to environmental changes?"""
 
+    temperature_settings = tuple(
+        f"input_number.{sleep}{setting}"
+        for sleep in ("", "sleep_")
+        for setting in (
+            "cooling_target_temperature",
+            "heating_target_temperature",
+            "low_temperature_aircon_trigger",
+            "high_temperature_aircon_trigger",
+        )
+    )
+
     def __init__(
         self,
         monitor_temperature: bool = True,
@@ -470,6 +1000,7 @@ class ClimateDevice(Device):
         )
         self.temperature_sensors = []
         self.humidity_sensors = []
+        self.dependencies: set[str] = set()
         for room in (self.room, *self.linked_rooms):
             temperature_sensor_id = f"sensor.{room}_apparent_temperature"
             humidity_sensor_id = f"sensor.{room}_humidity"
@@ -480,157 +1011,171 @@ class ClimateDevice(Device):
                 self.controller.get_entity(humidity_sensor_id),
             )
             if monitor_temperature:
-                self.controller.listen_state(
-                    self.handle_sensor_change,
-                    temperature_sensor_id,
-                    constrain_input_boolean=self.control_input_boolean,
-                )
+                self.dependencies.add(temperature_sensor_id)
             if monitor_humidity:
-                self.controller.listen_state(
-                    self.handle_sensor_change,
-                    humidity_sensor_id,
-                    constrain_input_boolean=self.control_input_boolean,
-                )
-        self.adjustment_delay = 0
-        self.last_adjustment_time = self.controller.get_now_ts()
-        self.adjustment_timer = None
+                self.dependencies.add(humidity_sensor_id)
+        if monitor_temperature:
+            self.dependencies.update(self.temperature_settings)
+        if monitor_humidity:
+            self.dependencies.add("input_number.humidifier_target")
+        self.temperature_readings = (
+            self.controller.readings.group(
+                sensor.entity_id for sensor in self.temperature_sensors
+            )
+            if monitor_temperature
+            else None
+        )
+        self.humidity_readings = (
+            self.controller.readings.group(
+                sensor.entity_id for sensor in self.humidity_sensors
+            )
+            if monitor_humidity
+            else None
+        )
+        self.all_rooms = (self.room, *self.linked_rooms)
+        self.evaluated: Decisions | None = None
+        self.doors: list[Entity] = []
+        self.thermal_model: ThermalModel | None = None
+        self.pre_conditioning_until = 0.0
+        self.pre_conditioning_mode = "off"
+        self.pre_conditioning_target = nan
 
     @property
     def room_temperature(self) -> float:
-        """"""
+        """Get the average temperature of the device's room (and linked rooms)."""
+        if self.temperature_readings is not None:
+            return self.controller.readings.average(self.temperature_readings)
         return sum(
-            float(temperature_sensor.state)
+            self.controller.get_float_state(temperature_sensor.entity_id)
             for temperature_sensor in self.temperature_sensors
         ) / len(self.temperature_sensors)
 
     @property
     def room_humidity(self) -> float:
-        """"""
+        """Get the average humidity of the device's room (and linked rooms)."""
+        if self.humidity_readings is not None:
+            return self.controller.readings.average(self.humidity_readings)
         return sum(
-            float(humidity_sensor.state) for humidity_sensor in self.humidity_sensors
+            self.controller.get_float_state(humidity_sensor.entity_id)
+            for humidity_sensor in self.humidity_sensors
         ) / len(self.humidity_sensors)
 
-    # TODO: consider making a TemperatureChecker class with all the following checks
-    # e.g. to switch room_temperature and inside_temperature
+    @property
+    def door_open(self) -> bool:
+        """Check if any of the device's doors are open."""
+        return False
+
+    @property
+    def pre_conditioning(self) -> bool:
+        """Check if a booked pre-conditioning run is keeping the device on."""
+        return self.controller.get_now_ts() < self.pre_conditioning_until
+
+    def predicted_room_temperature(
+        self,
+        seconds: float,
+        *,
+        heating: bool = False,
+        cooling: bool = False,
+    ) -> float | None:
+        """Predict the room temperature after some seconds (None if unknown)."""
+        outside = self.controller.outside_temperature_reading
+        if self.thermal_model is None or isnan(outside):
+            return None
+        return self.thermal_model.predict(
+            self.room_temperature,
+            outside,
+            seconds,
+            heating=heating,
+            cooling=cooling,
+            door=self.door_open,
+        )
+
+    def seconds_to_reach(
+        self,
+        target: float,
+        *,
+        heating: bool = False,
+        cooling: bool = False,
+    ) -> float:
+        """Predict seconds until the room reaches a target (inf if unknown/never)."""
+        outside = self.controller.outside_temperature_reading
+        if self.thermal_model is None or isnan(outside):
+            return inf
+        return self.thermal_model.seconds_to_reach(
+            self.room_temperature,
+            target,
+            outside,
+            heating=heating,
+            cooling=cooling,
+            door=self.door_open,
+        )
+
+    @property
+    def readings_available(self) -> bool:
+        """Check the room (or a linked room) has the readings the device acts on."""
+        readings = self.controller.readings
+        return not any(
+            isnan(readings.average(group))
+            for group in (self.temperature_readings, self.humidity_readings)
+            if group is not None
+        )
+
+    @property
+    def decisions(self) -> Decisions:
+        """Get the climate decisions for the room's temperature."""
+        if self.evaluated is not None:
+            return self.evaluated
+        return self.controller.room_decisions(
+            self.all_rooms,
+            lambda: self.room_temperature,
+        )
 
     @property
     def within_target_temperatures(self) -> bool:
         """Check if temperature is not above or below target temperatures."""
-        return not (self.above_target_temperature or self.below_target_temperature)
+        return self.decisions.within_target_temperatures
 
     @property
     def above_target_temperature(self) -> bool:
         """Check if temperature is above the target temperature."""
-        return self.room_temperature > float(
-            self.controller.get_setting("cooling_target_temperature"),
-        )
+        return self.decisions.above_target_temperature
 
     @property
     def below_target_temperature(self) -> bool:
         """Check if temperature is below the target temperature."""
-        return self.room_temperature < self.controller.get_setting(
-            "heating_target_temperature",
-        )
+        return self.decisions.below_target_temperature
 
     @property
     def too_hot_or_cold(self) -> bool:
         """Check if temperature inside is above or below the max/min triggers."""
-        return not (
-            self.controller.get_setting("low_temperature_aircon_trigger")
-            < self.room_temperature
-            < self.controller.get_setting("high_temperature_aircon_trigger")
-        )
+        return self.decisions.too_hot_or_cold
 
     @property
     def closer_to_hot_than_cold(self) -> bool:
         """Return if temperature inside is closer to needing cooling than heating."""
-        return (
-            self.room_temperature
-            > (
-                self.controller.get_setting("cooling_target_temperature")
-                + self.controller.get_setting("heating_target_temperature")
-            )
-            / 2
-        )
+        return self.decisions.closer_to_hot_than_cold
 
     @property
     def hotter_outside(self) -> bool:
         """Check if temperature is higher outside than inside."""
-        return (
-            self.room_temperature
-            < self.controller.outside_temperature
-            - self.constants["inside_outside_trigger"]
-        )
+        return self.decisions.hotter_outside
 
     @property
     def colder_outside(self) -> bool:
         """Check if temperature is lower outside than inside."""
-        return (
-            self.room_temperature
-            > self.controller.outside_temperature
-            + self.constants["inside_outside_trigger"]
-        )
+        return self.decisions.colder_outside
 
     @property
     def too_hot_or_cold_outside(self) -> bool:
         """Check if outside temperature exceeds desired indoor thresholds."""
-        return not (
-            self.controller.get_setting("low_temperature_aircon_trigger")
-            <= self.controller.outside_temperature
-            <= self.controller.get_setting("high_temperature_aircon_trigger")
-        )
+        return self.decisions.too_hot_or_cold_outside
 
     @property
     def outside_temperature_nicer(self) -> bool:
         """Check if outside is a nicer temperature than inside."""
-        mode = self.controller.entities.climate.bedroom_aircon.state
+        mode = self.controller.get_state("climate.bedroom_aircon")
         # TODO: use aircon group state instead?
-        return any(
-            (
-                mode == "heat" and self.hotter_outside,
-                mode == "cool" and self.colder_outside,
-                mode == "off"
-                and (self.too_hot_or_cold and not self.too_hot_or_cold_outside),
-            ),
-        )
-
-    def handle_sensor_change(
-        self,
-        entity: str,
-        attribute: str,
-        old: float,
-        new: float,
-        **kwargs: dict,
-    ):
-        """Adjust for new conditions with delay if appropriate."""
-        del entity, attribute, old, new, kwargs
-        if (
-            self.adjustment_delay > 0
-            and self.adjustment_timer is None
-            and (
-                self.controller.get_now_ts() - self.last_adjustment_time
-                < self.adjustment_delay
-            )
-        ):
-            self.adjustment_timer = self.controller.run_in(
-                self.adjust_for_conditions_after_delay,
-                self.last_adjustment_time
-                + self.adjustment_delay
-                - self.controller.get_now_ts(),
-            )
-        else:
-            if (
-                self.adjustment_timer
-            ):  # TODO: this should be moved inside super adjust_for_conditions
-                self.controller.cancel_timer(self.adjustment_timer)
-                self.adjustment_timer = None
-            self.adjust_for_conditions()
-
-    def adjust_for_conditions_after_delay(self, **kwargs: dict):
-        """Delayed adjustment from timers initiated when handling presence change."""
-        del kwargs
-        self.adjustment_timer = None
-        self.adjust_for_conditions()
+        return self.decisions.outside_temperature_nicer(mode)
 
 
 class Aircon(ClimateDevice, PresenceDevice):
@@ -655,12 +1200,11 @@ class Aircon(ClimateDevice, PresenceDevice):
         self.preferred_swing_mode = (
             "both" if "both" in self.get_attribute("swing_modes") else "rangefull"
         )
-        # TODO: set adjustment_delay?
+        self.dependencies.add("sensor.outside_apparent_temperature")
         self.turn_off_timer_handle = None
-        self.vacating_delay = 60 * float(
-            controller.entities.input_number.aircon_vacating_delay.state,
+        self.vacating_delay = 60 * controller.control.settings.get(
+            "input_number.aircon_vacating_delay",
         )
-        self.doors: list[Entity] = []
         for door in doors:
             door_id = f"binary_sensor.{door}_door"
             self.doors.append(self.controller.get_entity(door_id))
@@ -676,18 +1220,47 @@ class Aircon(ClimateDevice, PresenceDevice):
                 duration=self.constants["aircon_reduce_fan_delay"],
             )
         self.__door_open_delay = None
-        self.door_open_delay = 60 * float(
-            controller.entities.input_number.aircon_door_check_delay.state,
+        self.door_open_delay = 60 * controller.control.settings.get(
+            "input_number.aircon_door_check_delay",
         )
         self.user_adjusted_on_time_threshold = 1
 
     @property
     def best_mode_for_conditions(self) -> str:
-        """?"""
-        return (
-            "cool"
-            if self.above_target_temperature or self.closer_to_hot_than_cold
-            else "heat"
+        """Get the mode of a booked pre-conditioning run or else for the conditions."""
+        if self.pre_conditioning:
+            return self.pre_conditioning_mode
+        return self.decisions.best_mode
+
+    @property
+    def will_be_too_hot_or_cold(self) -> bool:
+        """Predict if the room passes a trigger within aircon_start_ahead seconds."""
+        predicted = self.predicted_room_temperature(
+            self.constants.get("aircon_start_ahead", 0),
+        )
+        return predicted is not None and not (
+            self.controller.get_setting("low_temperature_aircon_trigger")
+            < predicted
+            < self.controller.get_setting("high_temperature_aircon_trigger")
+        )
+
+    @property
+    def will_reach_target(self) -> bool:
+        """Predict if the aircon reaches its target within aircon_stop_ahead seconds."""
+        mode = self.device.state
+        if mode not in ("cool", "heat"):
+            return False
+        return self.seconds_to_reach(
+            self.controller.get_setting(f"{mode}ing_target_temperature"),
+            heating=mode == "heat",
+            cooling=mode == "cool",
+        ) <= self.constants.get("aircon_stop_ahead", 0)
+
+    def estimated_power(self, difference: float) -> float:
+        """Estimate power (W) with the room some degrees off the aircon's target."""
+        return aircon_power(
+            difference,
+            self.constants["aircon_power_temperature_difference"],
         )
 
     @property
@@ -699,9 +1272,12 @@ class Aircon(ClimateDevice, PresenceDevice):
     def desired_target_temperature(self) -> float:
         """"""
         mode = self.best_mode_for_conditions
-        return self.controller.get_setting(
-            mode + "ing_target_temperature",
-        ) + self.constants["temperature_target_buffer"] * (
+        target = (
+            self.pre_conditioning_target
+            if self.pre_conditioning
+            else self.controller.get_setting(mode + "ing_target_temperature")
+        )
+        return target + self.constants["temperature_target_buffer"] * (
             1 if mode == "heat" else -1
         )  # TODO: potentially remove temperature_target_buffer?
 
@@ -759,30 +1335,35 @@ class Aircon(ClimateDevice, PresenceDevice):
         check_if_would_adjust_only: bool = False,
     ) -> bool:
         """Adjust aircon based on current conditions and target temperatures."""
-        if not self.control_enabled and not check_if_would_adjust_only:
-            return None
-        if (
-            "Away" in self.controller.control.scene
-            and not self.controller.presence.pets_home_alone
+        if not self.readings_available or (
+            not self.control_enabled and not check_if_would_adjust_only
         ):
+            return None
+        decisions = self.decisions
+        if decisions.unattended:
             if check_if_would_adjust_only:
                 return self.on
             self.turn_off()
             return None
         if not self.on:
-            if (
-                self.too_hot_or_cold
-                and (self.ignoring_vacancy or not self.vacant)
-                and not self.door_open
+            if not self.door_open and (
+                self.pre_conditioning
+                or (
+                    (decisions.too_hot_or_cold or self.will_be_too_hot_or_cold)
+                    and (self.ignoring_vacancy or not self.vacant)
+                )
             ):
                 if check_if_would_adjust_only:
                     return True
                 self.turn_on_for_conditions()
                 self.notify_if_turning_on_for_pets()
-        elif (
-            self.door_open
-            or self.within_target_temperatures
-            or (not self.ignoring_vacancy and self.vacant)
+        elif self.door_open or (
+            (
+                decisions.within_target_temperatures
+                or self.will_reach_target
+                or (not self.ignoring_vacancy and self.vacant)
+            )
+            and not self.pre_conditioning
         ):
             if check_if_would_adjust_only:
                 return True
@@ -889,6 +1470,80 @@ class Aircon(ClimateDevice, PresenceDevice):
             )
 
 
+class FanSpeeds:
+    """Valid speeds of a fan, their cooling effects and the speed for conditions.
+
+    Built from the fan's percentage step and the fan constants, so that
+    adjusting a fan is table lookups rather than repeated float algebra.
+    """
+
+    def __init__(
+        self,
+        speed_per_level: int,
+        cooling_per_speed: float,
+        reverse_reduction_factor: float,
+        speed_per_degree: float,
+    ):
+        """Tabulate effects per speed and direction, and degrees off per speed."""
+        self.key = (
+            speed_per_level,
+            cooling_per_speed,
+            reverse_reduction_factor,
+            speed_per_degree,
+        )
+        self.levels = tuple(
+            min(100, speed_per_level * level)
+            for level in range(ceil(100 / speed_per_level) + 1)
+        )
+        self.cooling_per_speed = {
+            False: cooling_per_speed,
+            True: cooling_per_speed / reverse_reduction_factor,
+        }
+        self.effects = {
+            (speed, reverse): speed * per_speed
+            for speed in self.levels
+            for reverse, per_speed in self.cooling_per_speed.items()
+        }
+        degrees_per_speed = (
+            1 + speed_per_degree + cooling_per_speed
+        ) / speed_per_degree
+        self.degrees_off_target = tuple(
+            speed * degrees_per_speed for speed in self.levels
+        )
+
+    def validate(self, speed: float) -> int:
+        """Round speed up to the nearest level, between the minimum and 100."""
+        return self.levels[
+            max(1, min(bisect_left(self.levels, speed), len(self.levels) - 1))
+        ]
+
+    def effect(self, speed: float, reverse: bool) -> float:
+        """Get the reduction in apparent temperature caused by a speed."""
+        effect = self.effects.get((speed, reverse))
+        return speed * self.cooling_per_speed[reverse] if effect is None else effect
+
+    def for_degrees_off_target(self, degrees: float) -> int:
+        """Get the cooling speed for degrees above target (0 if not above).
+
+        Formula derived from simultaneously solving the following:
+        apparent_temp = temp_without_fan - fan_cooling_per_speed * fan_speed
+        fan_speed = fan_speed_per_degree_off_target * (apparent_temp - target_temp)
+        so each level is desired once the temperature without the fan is more
+        degrees off target than the level below's tabulated degrees.
+        """
+        if degrees <= 0:
+            return 0
+        return self.levels[
+            max(
+                1,
+                min(
+                    bisect_left(self.degrees_off_target, degrees),
+                    len(self.levels) - 1,
+                ),
+            )
+        ]
+
+
 class Fan(ClimateDevice, PresenceDevice):
     """Control a fan and configure responses to environmental changes."""
 
@@ -911,12 +1566,12 @@ class Fan(ClimateDevice, PresenceDevice):
         self.speed_per_level = round(self.get_attribute("percentage_step"))
         self.speed_levels = round(100 / self.speed_per_level)
         self.minimum_speed = self.speed_per_level * 1
+        self.__speeds: FanSpeeds | None = None
         self.reverse_desired = self.reverse
         self.companion_device = companion_device
-        self.vacating_delay = 60 * float(
-            controller.entities.input_number.fan_vacating_delay.state,
+        self.vacating_delay = 60 * controller.control.settings.get(
+            "input_number.fan_vacating_delay",
         )
-        self.adjustment_delay = self.constants["fan_adjustment_delay"]
 
     @property
     def speed(self) -> float:
@@ -952,47 +1607,45 @@ class Fan(ClimateDevice, PresenceDevice):
         else:
             self.turn_on(percentage=new_speed)
 
+    @property
+    def speeds(self) -> FanSpeeds:
+        """Get the fan's speed table, rebuilt only when its constants change."""
+        key = (
+            self.speed_per_level,
+            self.constants["fan_cooling_per_speed"],
+            self.constants["fan_cooling_reduction_factor_when_reverse"],
+            self.constants["fan_speed_per_degree_off_target"],
+        )
+        if self.__speeds is None or self.__speeds.key != key:
+            self.__speeds = FanSpeeds(*key)
+        return self.__speeds
+
     def validate_speed(self, speed: float) -> float:
         """Round speed up to nearest level and ensure it's between min/max values."""
-        return max(
-            self.minimum_speed,
-            min(
-                100,
-                ceil(speed / self.speed_per_level) * self.speed_per_level,
-            ),
-        )
+        return self.speeds.validate(speed)
 
     @property
     def desired_cooling_speed(self) -> float:
-        """Calculate best fan speed for the current room temperature.
-
-        Formula derived from simultaneously solving the following:
-        apparent_temp = temp_without_fan - fan_cooling_per_speed * fan_speed
-        fan_speed = fan_speed_per_degree_off_target * (apparent_temp - target_temp)
-        """
-        speed = (
-            self.constants["fan_speed_per_degree_off_target"]
-            * (self.room_temperature_without_fan - self.target_temperature)
-            / (
-                1
-                + self.constants["fan_speed_per_degree_off_target"]
-                + self.constants["fan_cooling_per_speed"]
-            )
+        """Get the best fan speed for the current room temperature (0 if cool)."""
+        speeds = self.speeds
+        reverse = self.reverse
+        temperature_without_fan = self.room_temperature + speeds.effect(
+            self.speed,
+            reverse,
+        )
+        speed = speeds.for_degrees_off_target(
+            temperature_without_fan - self.target_temperature,
         )
         if self.controller.logger.isEnabledFor(
             logging.DEBUG,
         ):
-            validated_speed = self.validate_speed(speed)
-            temperature_change = self.cooling_effect_for_speed(
-                self.speed,
-                self.reverse,
-            ) - self.cooling_effect_for_speed(
-                validated_speed,
+            temperature_change = speeds.effect(self.speed, reverse) - speeds.effect(
+                speed,
                 reverse=False,
             )
             self.controller.log(
-                f"Desired cooling speed in the '{self.room}' is {speed:.1f}% ("
-                f"actual will be {validated_speed:.0f}%, current is {self.speed:.0f}%) "
+                f"Desired cooling speed in the '{self.room}' is {speed:.0f}% ("
+                f"current is {self.speed:.0f}%) "
                 f"which will change the apparent temperature by "
                 f"{temperature_change:.1f}C to "
                 f"{self.room_temperature + temperature_change:.1f}C",
@@ -1009,7 +1662,11 @@ class Fan(ClimateDevice, PresenceDevice):
     def reverse(self, new_reverse: bool):
         """Set the fan's spin direction (forward or reverse)."""
         self.reverse_desired = new_reverse
-        if self.on and self.reverse != new_reverse:
+        turning_on = self.on or self.controller.commands.requested(
+            self.device_id,
+            "turn_on",
+        )
+        if turning_on and self.reverse != new_reverse:
             # TODO: because reversing takes time, we may need to pause all logic while this happens
             self.call_service(
                 "set_direction",
@@ -1034,17 +1691,7 @@ class Fan(ClimateDevice, PresenceDevice):
         reverse: bool | None = None,
     ) -> float:
         """Calculate the reduction in apparent temperature caused by a given speed."""
-        if reverse is None:
-            reverse = self.reverse
-        return (
-            self.constants["fan_cooling_per_speed"]
-            * speed
-            / (
-                self.constants["fan_cooling_reduction_factor_when_reverse"]
-                if reverse
-                else 1
-            )
-        )
+        return self.speeds.effect(speed, self.reverse if reverse is None else reverse)
 
     @property
     def room_temperature_without_fan(self) -> float:
@@ -1063,18 +1710,18 @@ class Fan(ClimateDevice, PresenceDevice):
         check_if_would_adjust_only: bool = False,
     ) -> bool:
         """Calculate best fan speed for the current conditions and set accordingly."""
-        if not self.control_enabled and not check_if_would_adjust_only:
+        if not self.readings_available or (
+            not self.control_enabled and not check_if_would_adjust_only
+        ):
             return None
         speed = 0
         reverse = self.reverse
         # TODO: if Sleep or Morning and hot, don't turn fan on, only off - is this required, might happen naturally?
         # TODO: handle if heating target is higher than cooling target
-        if (
-            "Away" not in self.controller.control.scene
-            or self.controller.presence.pets_home_alone
-        ) and (self.ignoring_vacancy or not self.vacant):
-            if not self.within_target_temperatures:
-                if self.closer_to_hot_than_cold:
+        decisions = self.decisions
+        if not decisions.unattended and (self.ignoring_vacancy or not self.vacant):
+            if not decisions.within_target_temperatures:
+                if decisions.closer_to_hot_than_cold:
                     speed = self.desired_cooling_speed
                     reverse = False
                 elif (
@@ -1148,14 +1795,21 @@ class Heater(ClimateDevice, PresenceDevice):
         self.safe_when_vacant = safe_when_vacant
         self.vacating_delay = (
             60
-            * float(self.controller.entities.input_number.heater_vacating_delay.state)
+            * self.controller.control.settings.get("input_number.heater_vacating_delay")
             if safe_when_vacant
             else 0
         )
 
+    def estimated_power(self, difference: float) -> float:
+        """Estimate power (W) while heating (drawing its rated power regardless)."""
+        del difference
+        return self.constants["heater_power"]
+
     @property
     def desired_target_temperature(self) -> float:
-        """Get the heater's target temperature."""
+        """Get the heater's target temperature (a booked run's while it lasts)."""
+        if self.pre_conditioning:
+            return self.pre_conditioning_target
         return self.controller.get_setting("heating_target_temperature")
 
     @property
@@ -1227,13 +1881,19 @@ class Heater(ClimateDevice, PresenceDevice):
             if check_if_would_adjust_only:
                 return True
             self.turn_off()
-        elif self.control_enabled or check_if_would_adjust_only:
+        elif self.readings_available and (
+            self.control_enabled or check_if_would_adjust_only
+        ):
             if not self.on:
-                if self.room_too_cold and (self.ignoring_vacancy or not self.vacant):
+                if self.pre_conditioning or (
+                    self.room_too_cold and (self.ignoring_vacancy or not self.vacant)
+                ):
                     if check_if_would_adjust_only:
                         return True
                     self.turn_on_for_conditions()
-            elif self.room_warm_enough or (not self.ignoring_vacancy and self.vacant):
+            elif (
+                self.room_warm_enough or (not self.ignoring_vacancy and self.vacant)
+            ) and not self.pre_conditioning:
                 if check_if_would_adjust_only:
                     return True
                 self.turn_off()
@@ -1277,8 +1937,8 @@ class Humidifier(ClimateDevice, PresenceDevice):
             room=room,
             linked_rooms=linked_rooms,
         )
-        self.vacating_delay = 60 * float(
-            self.controller.entities.input_number.humidifier_vacating_delay.state,
+        self.vacating_delay = 60 * self.controller.control.settings.get(
+            "input_number.humidifier_vacating_delay",
         )
         self.controller.listen_state(
             self.handle_empty_water_tank,
@@ -1309,7 +1969,7 @@ class Humidifier(ClimateDevice, PresenceDevice):
     @property
     def desired_target_humidity(self) -> float:
         """Get the humidifier's target humidity."""
-        return float(self.controller.get_state("input_number.humidifier_target"))
+        return self.controller.control.settings.get("input_number.humidifier_target")
 
     @property
     def target_humidity(self) -> float:
@@ -1388,7 +2048,9 @@ class Humidifier(ClimateDevice, PresenceDevice):
         check_if_would_adjust_only: bool = False,
     ) -> bool:
         """Turn the humidifier on/off based on current and target humidities."""
-        if not self.control_enabled and not check_if_would_adjust_only:
+        if not self.readings_available or (
+            not self.control_enabled and not check_if_would_adjust_only
+        ):
             return None
         if (
             self.room_too_dry
@@ -6,14 +6,20 @@ User defined variables are configued in control.yaml
 """
 
 import datetime
-import urllib.request
+import math
+import re
+from array import array
+from collections import Counter
 
-from app import App, IDs
+import aiohttp
+from app import App, IDs, Settings
 
 
 class Control(App):
     """Controls the scene based on scheduled events, people's presence and input."""
 
+    log_breakdown_size = 20  # most frequent messages published per log level
+
     def __init__(self, *args, **kwargs):
         """Extend with attribute definitions."""
         super().__init__(*args, **kwargs)
@@ -26,9 +32,16 @@ class Control(App):
             "heartbeat": None,
             "heartbeat_fail_count": 0,
             "init_delay": None,
+            "log_counts": None,
         }
+        self.log_counts = {"warnings": Counter(), "errors": Counter()}
+        self.log_totals = {"warnings": 0, "errors": 0}
+        self.flushed_log_totals = {"warnings": 0, "errors": 0}
         self.is_all_initialised = False
         self.pre_sleep_scene = False
+        self.settings: Settings | None = None
+        self.batteries: Batteries | None = None
+        self.heartbeat_session: aiohttp.ClientSession | None = None
 
     def initialize(self):
         """Monitor logs, listen for user input, monitor batteries and set timers.
@@ -36,6 +49,7 @@ class Control(App):
         Appdaemon defined init function called once ready after __init__.
         """
         super().initialize()
+        self.settings = Settings(self)
         self.listen_log(self.handle_log)
         if self.entities.input_boolean.development_mode.state == "off":
             self.set_production_mode()
@@ -48,6 +62,7 @@ class Control(App):
             "input_number",
             "input_select",
         ]:
+            self.listen_state(self.handle_setting_update, setting)
             self.listen_state(
                 self.handle_ui_settings_change,
                 setting,
@@ -55,37 +70,17 @@ class Control(App):
             )
         self.listen_event(self.handle_button, "zwave_js_value_notification")
         self.listen_event(self.handle_ifttt, "ifttt_webhook_received")
-        for battery in (
-            "front_door_camera",
-            "back_door_camera",
-            "entryway_camera",
-            "door_lock",
-            "kitchen_door_sensor",
-            "entryway_multisensor",
-            "dining_room_multisensor",
-            "hall_multisensor",
-            "bathroom_multisensor",
-            "kitchen_door_sensor",
-            "kitchen_button",
-            "bedroom_button",
-            "nest_protect_entryway",
-            "nest_protect_living_room",
-            "nest_protect_garage",
-            "owlet",
-            "toothbrush",
-            "soil_sensor_entryway",
-            "soil_sensor_guest_suite",
-            "soil_sensor_stairway",
-            "soil_sensor_back_deck",
-            "soil_sensor_living_room",
-            "soil_sensor_dining_room",
-            "soil_sensor_bathroom",
-            "soil_sensor_office",
-        ):
-            self.listen_state(
-                self.handle_battery_level_change,
-                f"sensor.{battery}_battery_level",
-            )
+        self.batteries = Batteries(self)
+        self.run_every(
+            self.batteries.check,
+            self.datetime()
+            + datetime.timedelta(seconds=self.constants["battery_check_period"]),
+            self.constants["battery_check_period"],
+        )
+        self.run_daily(
+            self.batteries.notify_digest,
+            self.constants["battery_digest_time"],
+        )
         self.set_timer("morning_time")
         self.run_daily(self.handle_day_time, self.constants["day_time"])
         self.set_timer("nursery_time")
@@ -145,6 +140,7 @@ class Control(App):
     def scene(self, new_scene: str):
         """Propagate scene change to other apps and sync scene with Home Assistant."""
         self.log(f"Setting scene to '{new_scene}' (was previously '{self.scene}')")
+        self.settings.update("input_select.scene", new_scene)
         self.lights.transition_to_scene(new_scene)
         self.climate.transition_to_scene(new_scene)
         if new_scene == "Sleep" or "Away" in new_scene:
@@ -246,11 +242,6 @@ class Control(App):
             self.climate.pre_condition_nursery()
         self.presence.lock_door()
 
-    @property
-    def bed_time(self) -> bool:
-        """Return if the time is after bed time (and before midnight)."""
-        return self.time() > self.parse_time(self.get_setting("bed_time"))
-
     def handle_button(self, event_name: str, data: dict, **kwargs: dict):
         """Detect and handle when a button is clicked or held."""
         # TODO: add new buttons and rework the following
@@ -328,6 +319,18 @@ class Control(App):
             else:
                 self.presence.lock_door()
 
+    def handle_setting_update(
+        self,
+        entity: str,
+        attribute: str,
+        old,
+        new,
+        **kwargs: dict,
+    ):
+        """Keep the settings store in sync as soon as a setting changes."""
+        del attribute, old, kwargs
+        self.settings.update(entity, new)
+
     def handle_ui_settings_change(
         self,
         entity: str,
@@ -360,11 +363,8 @@ class Control(App):
         """Act on changes to settings that can only be made through the UI."""
         if setting == "development_mode":
             self.set_production_mode(new == "off")
-        elif setting.startswith("circadian"):
-            try:
-                self.lights.redate_circadian()
-            except ValueError:
-                self.revert_setting(f"input_datetime.{setting}", old)
+        elif "circadian" in setting:
+            self.handle_circadian_setting_change(setting, old)
         elif setting.endswith("_time"):
             if self.valid_time_settings:
                 self.set_timer(setting)
@@ -374,6 +374,8 @@ class Control(App):
             self.climate.validate_target_and_trigger(setting)
         elif "door" in setting:
             self.climate.update_door_check_delay(float(new))
+        elif setting == "humidifier_target":
+            self.climate.adjust_dependents(f"input_number.{setting}")
         else:
             device_type = setting.split("_")[0]
             if setting.endswith("vacating_delay") and device_type in (
@@ -386,6 +388,20 @@ class Control(App):
             else:
                 self.lights.transition_to_scene(self.scene)
 
+    def handle_circadian_setting_change(self, setting: str, old: str):
+        """Rebuild the circadian schedule (or revert if invalid) and apply it."""
+        try:
+            self.lights.redate_circadian()
+        except ValueError:
+            self.revert_setting(
+                f"input_{'datetime' if setting.endswith('_time') else 'number'}"
+                f".{setting}",
+                old,
+            )
+        else:
+            if self.scene != "Night":
+                self.lights.transition_to_scene(self.scene)
+
     def revert_setting(self, setting_id: str, value: str):
         """Revert setting to specified value & notify."""
         if setting_id.startswith("input_datetime"):
@@ -405,39 +421,37 @@ class Control(App):
             title="Invalid Setting",
         )
 
-    def handle_battery_level_change(
-        self,
-        entity: str,
-        attribute: str,
-        old: str,
-        new: str,
-        **kwargs: dict,
-    ):
-        """Notify if a device's battery is low."""
-        del attribute, kwargs
-        # TODO: https://app.asana.com/0/1207020279479204/1207033183115380/f
-        # convert all of these unavailable checks to try float?
-        # TODO: https://app.asana.com/0/1207020279479204/1205753645479424/f
-        # don't just check for battery level, periodically check for last date of any update
-        # TODO: https://app.asana.com/0/1207020279479204/1207033183175577/f
-        # notify of low battery level only once per day and only if different to previous (or unavailable/old date)
-        if new in ("unavailable", "unknown", None):
-            self.log(f"'{entity}' is '{new}'", level="WARNING")
-        elif float(new) <= self.constants["notify_battery_level"] and (
-            old in ("unavailable", "unknown", None)
-            or float(old) >= self.constants["notify_battery_level"]
-        ):
-            self.notify(f"{entity} is low ({new}%)", title="Low Battery", targets="dan")
+    async def terminate(self):
+        """Close the heartbeat connection.
+
+        Appdaemon defined function called before termination.
+        """
+        if self.heartbeat_session is not None:
+            await self.heartbeat_session.close()
 
-    def heartbeat(self, **kwargs: dict):
-        """Send a heartbeat then handle if it is received or not."""
+    async def heartbeat(self, **kwargs: dict):
+        """Send a heartbeat without blocking a worker thread then handle the result."""
         del kwargs
+        if self.heartbeat_session is None:
+            self.heartbeat_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(
+                    total=self.constants["heartbeat_timeout"],
+                ),
+            )
         try:
-            urllib.request.urlopen(  # noqa: S310
+            async with self.heartbeat_session.get(
                 self.constants["heartbeat_url"],
-                timeout=self.constants["heartbeat_timeout"],
-            )
-        except OSError:
+                raise_for_status=True,
+            ) as response:
+                await response.read()
+        except (aiohttp.ClientError, TimeoutError):
+            self.handle_heartbeat_result(received=False)
+        else:
+            self.handle_heartbeat_result(received=True)
+
+    def handle_heartbeat_result(self, *, received: bool):
+        """Count failed heartbeats, going offline (and restarting when back) if many."""
+        if not received:
             self.timers["heartbeat_fail_count"] += 1
             if (
                 self.online
@@ -446,22 +460,22 @@ class Control(App):
             ):
                 self.online = False
                 self.log("Heartbeat timed out", level="WARNING")
-        else:
-            if self.timers["heartbeat_fail_count"] > 0:
-                self.log(
-                    "Heartbeat sent and recieved after "
-                    f"{self.timers['heartbeat_fail_count']} timeout(s)",
-                )
-            if not self.online:
-                self.online = True
-                if (
-                    self.timers["heartbeat_fail_count"]
-                    >= self.constants["heartbeat_max_fail_count"]
-                ):
-                    self.log("Restarting Home Assistant to fix any broken entities")
-                    self.cancel_listen_log(self.handle_log)
-                    self.call_service("homeassistant/restart")
-            self.timers["heartbeat_fail_count"] = 0
+            return
+        if self.timers["heartbeat_fail_count"] > 0:
+            self.log(
+                "Heartbeat sent and recieved after "
+                f"{self.timers['heartbeat_fail_count']} timeout(s)",
+            )
+        if not self.online:
+            self.online = True
+            if (
+                self.timers["heartbeat_fail_count"]
+                >= self.constants["heartbeat_max_fail_count"]
+            ):
+                self.log("Restarting Home Assistant to fix any broken entities")
+                self.cancel_listen_log(self.handle_log)
+                self.call_service("homeassistant/restart")
+        self.timers["heartbeat_fail_count"] = 0
 
     def handle_log(
         self,
@@ -472,17 +486,52 @@ class Control(App):
         message: str,
         **kwargs: dict,
     ):
-        """Increment counters if logged message is a WARNING or ERROR."""
-        del app_name, timestamp, kwargs
+        """Count WARNING and ERROR messages (by app and message), flushed shortly."""
+        del timestamp, kwargs
         if log_type == "error_log":
             level = "ERROR" if message.startswith("Traceback") else None
         elif log_type == "main_log" and message.endswith("errors.log"):
             level = None
         if level in ("WARNING", "ERROR"):
-            self.call_service(
-                "counter/increment",
-                entity_id=f"counter.{level.lower()}s",
-            )
+            counter = f"{level.lower()}s"
+            self.log_totals[counter] += 1
+            self.log_counts[counter][f"{app_name}: {self.fingerprint(message)}"] += 1
+            if self.timers["log_counts"] is None:
+                self.timers["log_counts"] = self.run_in(
+                    self.flush_log_counts,
+                    self.constants["log_count_flush_period"],
+                )
+
+    @staticmethod
+    def fingerprint(message: str) -> str:
+        """Reduce a log message to its template by masking quoted values and numbers."""
+        message = message.splitlines()[-1] if message else message
+        message = re.sub(r"'[^']*'|\"[^\"]*\"", "'*'", message)
+        return re.sub(r"\d+(\.\d+)?", "#", message)[:100]
+
+    def flush_log_counts(self, **kwargs: dict):
+        """Set the warning/error counters and publish the counts by app and message."""
+        del kwargs
+        self.timers["log_counts"] = None
+        for counter, total in self.log_totals.items():
+            if total != self.flushed_log_totals[counter]:
+                self.flushed_log_totals[counter] = total
+                self.call_service(
+                    "counter/set_value",
+                    entity_id=f"counter.{counter}",
+                    value=total,
+                )
+        self.set_state(
+            "sensor.log_counts",
+            state=sum(self.log_totals.values()),
+            attributes={
+                "friendly_name": "Log Counts",
+                **{
+                    counter: dict(counts.most_common(self.log_breakdown_size))
+                    for counter, counts in self.log_counts.items()
+                },
+            },
+        )
 
     def handle_update_available(
         self,
@@ -508,3 +557,81 @@ class Control(App):
             title="Update Available",
             targets="dan",
         )
+
+
+class Batteries:
+    """Levels and last reports of every battery sensor, checked together periodically.
+
+    Battery sensors are discovered by device class, with their levels (NaN when
+    unavailable) and last report times held in arrays indexed by sensor.
+    """
+
+    def __init__(self, controller: Control):
+        """Discover battery sensors and read their current levels."""
+        self.controller = controller
+        self.entity_ids: list[str] = []
+        self.indexes: dict[str, int] = {}
+        self.levels = array("f")
+        self.last_seen = array("d")
+        self.last_digest: tuple = ()
+        self.check()
+
+    def check(self, **kwargs: dict):
+        """Update every battery's level and last report (adding new batteries)."""
+        del kwargs
+        for entity_id, state in self.controller.get_state("sensor").items():
+            if state["attributes"].get("device_class") != "battery":
+                continue
+            index = self.indexes.get(entity_id)
+            if index is None:
+                index = self.indexes[entity_id] = len(self.entity_ids)
+                self.entity_ids.append(entity_id)
+                self.levels.append(math.nan)
+                self.last_seen.append(0)
+            try:
+                level = float(state["state"])
+            except (TypeError, ValueError):
+                level = math.nan
+                if not math.isnan(self.levels[index]):
+                    self.controller.log(
+                        f"'{entity_id}' is '{state['state']}'",
+                        level="WARNING",
+                    )
+            self.levels[index] = level
+            self.last_seen[index] = self.controller.convert_utc(
+                state.get("last_reported") or state["last_updated"],
+            ).timestamp()
+
+    def problems(self) -> tuple[tuple[str, str], ...]:
+        """Get batteries that are low, unavailable or have not reported recently."""
+        threshold = self.controller.constants["notify_battery_level"]
+        now = self.controller.get_now_ts()
+        silent_before = now - self.controller.constants["battery_silent_hours"] * 3600
+        problems = []
+        for entity_id, level, last_seen in zip(
+            self.entity_ids,
+            self.levels,
+            self.last_seen,
+            strict=True,
+        ):
+            if last_seen < silent_before:
+                days = (now - last_seen) / 86400
+                problems.append((entity_id, f"silent for {days:.0f} days"))
+            elif math.isnan(level):
+                problems.append((entity_id, "unavailable"))
+            elif level <= threshold:
+                problems.append((entity_id, f"{level:.0f}%"))
+        return tuple(problems)
+
+    def notify_digest(self, **kwargs: dict):
+        """Send one notification listing battery problems (if changed since last)."""
+        del kwargs
+        self.check()
+        problems = self.problems()
+        if problems and problems != self.last_digest:
+            self.controller.notify(
+                "\n".join(f"{entity_id}: {problem}" for entity_id, problem in problems),
+                title="Low Battery",
+                targets="dan",
+            )
+        self.last_digest = problems
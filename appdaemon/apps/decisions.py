@@ -0,0 +1,114 @@
+"""Decide how a room's climate compares with its targets, triggers and outside.
+
+Conditions are single comparisons of a room's inputs, and rules combine those
+conditions into further decisions. Both are declared below, and the rules are
+compiled ahead of time into a table holding every decision for each combination
+of conditions, so deciding for a room is a handful of comparisons and a lookup.
+
+Comparisons with an unavailable (NaN) temperature are all false, so while the
+outside sensor is unavailable nothing is decided in favour of outside and the
+inside decisions are unaffected.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class Inputs(NamedTuple):
+    """A room's (or the house's) climate and the settings it's judged against."""
+
+    temperature: float
+    outside: float
+    cooling_target: float
+    heating_target: float
+    low_trigger: float
+    high_trigger: float
+    inside_outside_trigger: float
+    unattended: bool  # an Away scene without the pets home alone
+
+
+class Decisions(NamedTuple):
+    """Every condition and rule decided for a room."""
+
+    above_target_temperature: bool
+    below_target_temperature: bool
+    too_hot_or_cold: bool
+    closer_to_hot_than_cold: bool
+    hotter_outside: bool
+    colder_outside: bool
+    too_hot_or_cold_outside: bool
+    pleasant_outside: bool
+    unattended: bool
+    within_target_temperatures: bool
+    outside_temperature_nicer_when_heat: bool
+    outside_temperature_nicer_when_cool: bool
+    outside_temperature_nicer_when_off: bool
+    best_mode: str
+
+    def outside_temperature_nicer(self, mode: str) -> bool:
+        """Check if outside is nicer than inside given the aircons' mode."""
+        return getattr(self, f"outside_temperature_nicer_when_{mode}", False)
+
+
+CONDITIONS: dict[str, Callable[[Inputs], bool]] = {
+    "above_target_temperature": lambda i: i.temperature > i.cooling_target,
+    "below_target_temperature": lambda i: i.temperature < i.heating_target,
+    "too_hot_or_cold": lambda i: (
+        i.temperature <= i.low_trigger or i.temperature >= i.high_trigger
+    ),
+    "closer_to_hot_than_cold": lambda i: (
+        i.temperature > (i.cooling_target + i.heating_target) / 2
+    ),
+    "hotter_outside": lambda i: i.temperature < i.outside - i.inside_outside_trigger,
+    "colder_outside": lambda i: i.temperature > i.outside + i.inside_outside_trigger,
+    "too_hot_or_cold_outside": lambda i: (
+        i.outside < i.low_trigger or i.outside > i.high_trigger
+    ),
+    "pleasant_outside": lambda i: i.low_trigger <= i.outside <= i.high_trigger,
+    "unattended": lambda i: i.unattended,
+}
+
+RULES: dict[str, Callable[[dict[str, bool]], bool | str]] = {
+    "within_target_temperatures": lambda c: not (
+        c["above_target_temperature"] or c["below_target_temperature"]
+    ),
+    "outside_temperature_nicer_when_heat": lambda c: c["hotter_outside"],
+    "outside_temperature_nicer_when_cool": lambda c: c["colder_outside"],
+    "outside_temperature_nicer_when_off": lambda c: (
+        c["too_hot_or_cold"] and c["pleasant_outside"]
+    ),
+    "best_mode": lambda c: (
+        "cool"
+        if c["above_target_temperature"] or c["closer_to_hot_than_cold"]
+        else "heat"
+    ),
+}
+
+
+def compile_table() -> tuple[Decisions, ...]:
+    """Decide every rule for each combination of conditions (indexed by bits)."""
+    table = []
+    for bits in range(2 ** len(CONDITIONS)):
+        conditions = {
+            name: bool(bits >> index & 1) for index, name in enumerate(CONDITIONS)
+        }
+        table.append(
+            Decisions(
+                **conditions,
+                **{name: rule(conditions) for name, rule in RULES.items()},
+            ),
+        )
+    return tuple(table)
+
+
+TABLE = compile_table()
+_CONDITIONS = tuple(enumerate(CONDITIONS.values()))
+
+
+def decide(inputs: Inputs) -> Decisions:
+    """Look up every decision for a room's inputs."""
+    return TABLE[sum(condition(inputs) << index for index, condition in _CONDITIONS)]
@@ -10,6 +10,8 @@ from __future__ import annotations
 
 import datetime
 import logging
+from array import array
+from math import ceil
 
 from app import App
 from presence import PresenceDevice
@@ -21,7 +23,7 @@ class Lights(App):
     def __init__(self, *args, **kwargs):
         """Extend with attribute definitions."""
         super().__init__(*args, **kwargs)
-        self.circadian = {"timer": None}
+        self.circadian = {"timer": None, "applied": {}}
         self.__lights: dict[str, Light] = {}
         self.constants["brightness_per_step"] = 2.55
         self.constants["kelvin_per_step"] = 20
@@ -121,20 +123,22 @@ class Lights(App):
     def transition_to_scene(self, scene: str):
         """Change lighting based on the specified scene."""
         self.cancel_timer(self.circadian["timer"])
-        if "Day" in scene:
-            self.transition_to_day_scene()
-        elif scene == "Night":
-            self.start_circadian()
-        elif scene == "Bright":
-            self.transition_to_bright_scene()
-        elif scene == "TV":
-            self.transition_to_tv_scene()
-        elif scene == "Sleep":
-            self.transition_to_sleep_scene()
-        elif scene == "Morning":
-            self.transition_to_morning_scene()
-        elif scene == "Away (Night)":
-            self.transition_to_away_scene()
+        self.circadian["applied"].clear()
+        with self.commands.plan():
+            if "Day" in scene:
+                self.transition_to_day_scene()
+            elif scene == "Night":
+                self.start_circadian()
+            elif scene == "Bright":
+                self.transition_to_bright_scene()
+            elif scene == "TV":
+                self.transition_to_tv_scene()
+            elif scene == "Sleep":
+                self.transition_to_sleep_scene()
+            elif scene == "Morning":
+                self.transition_to_morning_scene()
+            elif scene == "Away (Night)":
+                self.transition_to_away_scene()
         self.log(f"Light scene changed to '{scene}'")
 
     def transition_to_day_scene(self):
@@ -172,7 +176,7 @@ class Lights(App):
 
     def transition_to_tv_scene(self):
         """Configure lighting for the tv scene."""
-        kelvin = int(float(self.entities.input_number.tv_kelvin.state))
+        kelvin = self.get_setting("tv_kelvin")
         self.lights["entryway"].set_presence_adjustments(
             occupied=(
                 self.get_setting("tv_motion_brightness"),
@@ -296,8 +300,8 @@ class Lights(App):
                     self.constants["max_brightness"],
                     self.lights[light_name].kelvin_limits["max"],
                 ),
-                vacating_delay=float(
-                    self.entities.input_number.night_vacating_delay.state,
+                vacating_delay=self.control.settings.get(
+                    "input_number.night_vacating_delay",
                 ),
             )
         if self.now_is_between("12:00:00", "23:59:59"):
@@ -351,58 +355,58 @@ class Lights(App):
         brightness, kelvin = self.calculate_circadian_brightness_kelvin(
             circadian_progress,
         )
-        self.lights["entryway"].set_presence_adjustments(
-            occupied=(brightness, kelvin),
-            vacating_delay=self.get_setting("night_vacating_delay"),
-        )
-        self.lights["kitchen"].set_presence_adjustments(
-            vacant=(brightness, kelvin),
-            entered=(
-                max(brightness, self.get_setting("night_motion_brightness")),
-                kelvin,
-            ),
-            occupied=(
-                self.constants["max_brightness"],
-                self.get_setting("night_motion_kelvin"),
-            ),
-            transition_period=self.get_setting("night_transition_period"),
-            vacating_delay=self.get_setting("night_vacating_delay"),
-        )
-        self.lights["kitchen_strip"].set_presence_adjustments(
-            entered=(brightness, kelvin)
-            if brightness >= self.get_setting("night_motion_brightness")
-            else (self.get_setting("night_motion_brightness"), kelvin),
-            occupied=(
-                self.constants["max_brightness"],
-                self.get_setting("night_motion_kelvin"),
-            ),
-            transition_period=self.get_setting("night_transition_period"),
-            vacating_delay=self.get_setting("night_vacating_delay"),
-        )
-        self.lights["dining_room"].set_presence_adjustments(
-            vacant=(brightness, kelvin),
-            entered=(brightness, kelvin),
-            occupied=(
-                max(brightness, self.get_setting("night_motion_brightness")),
-                kelvin,
-            ),
-            transition_period=self.get_setting("night_transition_period"),
-            vacating_delay=self.get_setting("night_vacating_delay"),
-        )
-        for light_name in ("tv", "hall"):
-            self.lights[light_name].adjust(brightness, kelvin)
-        self.lights["office"].set_presence_adjustments(
-            occupied=(brightness, kelvin),
-            vacating_delay=self.get_setting("office_vacating_delay"),
-        )
-        self.lights["bedroom"].set_presence_adjustments(
-            occupied=(brightness, kelvin),
-            vacating_delay=self.get_setting("night_vacating_delay"),
-        )
-        self.lights["bathroom"].set_presence_adjustments(
-            occupied=(brightness, kelvin),
-            vacating_delay=self.get_setting("night_vacating_delay"),
-        )
+        motion_brightness = self.get_setting("night_motion_brightness")
+        motion_kelvin = self.get_setting("night_motion_kelvin")
+        transition_period = self.get_setting("night_transition_period")
+        vacating_delay = self.get_setting("night_vacating_delay")
+        presence_adjustments = {
+            "entryway": {
+                "occupied": (brightness, kelvin),
+                "vacating_delay": vacating_delay,
+            },
+            "kitchen": {
+                "vacant": (brightness, kelvin),
+                "entered": (max(brightness, motion_brightness), kelvin),
+                "occupied": (self.constants["max_brightness"], motion_kelvin),
+                "transition_period": transition_period,
+                "vacating_delay": vacating_delay,
+            },
+            "kitchen_strip": {
+                "entered": (max(brightness, motion_brightness), kelvin),
+                "occupied": (self.constants["max_brightness"], motion_kelvin),
+                "transition_period": transition_period,
+                "vacating_delay": vacating_delay,
+            },
+            "dining_room": {
+                "vacant": (brightness, kelvin),
+                "entered": (brightness, kelvin),
+                "occupied": (max(brightness, motion_brightness), kelvin),
+                "transition_period": transition_period,
+                "vacating_delay": vacating_delay,
+            },
+            "office": {
+                "occupied": (brightness, kelvin),
+                "vacating_delay": self.get_setting("office_vacating_delay"),
+            },
+            "bedroom": {
+                "occupied": (brightness, kelvin),
+                "vacating_delay": vacating_delay,
+            },
+            "bathroom": {
+                "occupied": (brightness, kelvin),
+                "vacating_delay": vacating_delay,
+            },
+        }
+        applied = self.circadian["applied"]
+        with self.commands.plan():
+            for light_name, adjustments in presence_adjustments.items():
+                if applied.get(light_name) != adjustments:
+                    applied[light_name] = adjustments
+                    self.lights[light_name].set_presence_adjustments(**adjustments)
+            for light_name in ("tv", "hall"):
+                if applied.get(light_name) != (brightness, kelvin):
+                    applied[light_name] = (brightness, kelvin)
+                    self.lights[light_name].adjust(brightness, kelvin)
         # TODO: https://app.asana.com/0/1207020279479204/1207033183115368/f
         # temporarily never turn on nursery light
         # if (
@@ -443,56 +447,44 @@ class Lights(App):
         self,
         circadian_progress: float | None = None,
     ) -> tuple[int, int]:
-        """Calculate appropriate lighting levels based on the circadian progression."""
+        """Look up lighting levels for the circadian progression in today's schedule."""
         if circadian_progress is None:
             circadian_progress = self.circadian_progress
-        return (
-            int(
-                float(self.entities.input_number.initial_circadian_brightness.state)
-                + (
-                    float(self.entities.input_number.final_circadian_brightness.state)
-                    - float(
-                        self.entities.input_number.initial_circadian_brightness.state,
-                    )
-                )
-                * circadian_progress,
-            ),
-            int(
-                float(self.entities.input_number.initial_circadian_kelvin.state)
-                + (
-                    float(self.entities.input_number.final_circadian_kelvin.state)
-                    - float(self.entities.input_number.initial_circadian_kelvin.state)
-                )
-                * circadian_progress,
-            ),
-        )
+        step = round(circadian_progress * (len(self.circadian["brightness"]) - 1))
+        return self.circadian["brightness"][step], self.circadian["kelvin"][step]
+
+    @staticmethod
+    def quantize(value: float, origin: float, step: float) -> int:
+        """Round a value to a whole number of steps from its origin."""
+        return int(origin + round((value - origin) / step) * step)
 
     def redate_circadian(self, **kwargs: dict):
         """Configure the start and end times for lighting adjustment for today."""
         del kwargs
+        settings = self.control.settings
         start_time = datetime.datetime.combine(
             self.date(),
             self.sunset().time(),
         ) + datetime.timedelta(
-            hours=float(
-                self.entities.input_number.circadian_initial_sunset_offset.state,
-            ),
+            hours=settings.get("input_number.circadian_initial_sunset_offset"),
         )
         end_time = self.parse_datetime(
-            self.entities.input_datetime.circadian_end_time.state,
+            settings.get("input_datetime.circadian_end_time"),
         )
-        time_step = (end_time - start_time) / max(
-            abs(
-                float(self.entities.input_number.initial_circadian_brightness.state)
-                - float(self.entities.input_number.final_circadian_brightness.state),
-            )
-            / self.constants["brightness_per_step"],
-            abs(
-                float(self.entities.input_number.initial_circadian_kelvin.state)
-                - float(self.entities.input_number.final_circadian_kelvin.state),
-            )
-            / self.constants["kelvin_per_step"],
+        initial_brightness = settings.get("input_number.initial_circadian_brightness")
+        initial_kelvin = settings.get("input_number.initial_circadian_kelvin")
+        brightness_range = (
+            settings.get("input_number.final_circadian_brightness") - initial_brightness
         )
+        kelvin_range = (
+            settings.get("input_number.final_circadian_kelvin") - initial_kelvin
+        )
+        steps = max(
+            ceil(abs(brightness_range) / self.constants["brightness_per_step"]),
+            ceil(abs(kelvin_range) / self.constants["kelvin_per_step"]),
+            1,
+        )
+        time_step = (end_time - start_time) / steps
         if time_step.total_seconds() < 0:
             self.error(
                 "Circadian end time is before start time "
@@ -502,6 +494,29 @@ class Lights(App):
         self.circadian["start_time"] = start_time
         self.circadian["end_time"] = end_time
         self.circadian["time_step"] = time_step
+        self.circadian["brightness"] = array(
+            "H",
+            (
+                self.quantize(
+                    initial_brightness + brightness_range * step / steps,
+                    initial_brightness,
+                    self.constants["brightness_per_step"],
+                )
+                for step in range(steps + 1)
+            ),
+        )
+        self.circadian["kelvin"] = array(
+            "H",
+            (
+                self.quantize(
+                    initial_kelvin + kelvin_range * step / steps,
+                    initial_kelvin,
+                    self.constants["kelvin_per_step"],
+                )
+                for step in range(steps + 1)
+            ),
+        )
+        self.circadian["applied"].clear()
         self.log(
             f"Circadian redated to start at {start_time.time()} with "
             f"time step of {time_step.total_seconds() / 60} minutes",
@@ -809,7 +824,9 @@ class Light(PresenceDevice):
 
     def turn_off(self):
         """Turn light off and record previous kelvin level."""
-        if self.control_enabled and self.brightness != 0:
+        if not self.control_enabled:
+            return
+        if self.brightness != 0:
             self.kelvin_before_off = self.kelvin
             if self.controller.logger.isEnabledFor(logging.DEBUG):
                 self.controller.log(
@@ -817,7 +834,7 @@ class Light(PresenceDevice):
                     f" {self.brightness} brightness and {self.kelvin} kelvin)",
                     level="DEBUG",
                 )
-            super().turn_off()
+        super().turn_off()
 
     def set_presence_adjustments(
         self,
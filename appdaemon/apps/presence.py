@@ -8,12 +8,21 @@ User defined variables are configued in presence.yaml
 
 from __future__ import annotations
 
+import itertools
 import logging
+import threading
+import traceback
 import uuid
-from datetime import timedelta
+from array import array
+from datetime import UTC, datetime, timedelta
+from math import ceil, inf
+from typing import TYPE_CHECKING
 
 from app import App, Device
 
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
 
 class Presence(App):
     """Monitor presence in the house."""
@@ -24,6 +33,8 @@ class Presence(App):
         self.rooms = {}
         self.__pets_home_alone = False
         self.last_device_date = None
+        self.timer_wheel = None
+        self.callback_handles = itertools.count(1)
 
     def initialize(self):
         """Create rooms with sensors and listen for new devices and people.
@@ -31,6 +42,7 @@ class Presence(App):
         Appdaemon defined init function called once ready after __init__.
         """
         super().initialize()
+        self.timer_wheel = TimerWheel(self, self.constants["timer_wheel_resolution"])
         self.pets_home_alone = self.entities.input_boolean.pets_home_alone.state == "on"
         # TODO: https://app.asana.com/0/1207020279479204/1207033183175547/f
         # add overide functionality so that if pets home alone mode is manually turned off it doesn't turn on again until after someone comes home and leaves again
@@ -90,6 +102,35 @@ class Presence(App):
         self.listen_state(self.handle_presence_change, "person")
         self.last_device_date = self.date()
         self.listen_event(self.handle_new_device, "device_tracker_new_device")
+        if "occupancy_statistics_period" in self.constants:
+            self.run_every(
+                self.publish_occupancy_statistics,
+                "now",
+                self.constants["occupancy_statistics_period"],
+            )
+
+    @property
+    def now_ts(self) -> float:
+        """Get the time used for occupancy checks, read once per state snapshot."""
+        return self.snapshot_cached(("presence_now",), self.get_now_ts)
+
+    def publish_occupancy_statistics(self, **kwargs: dict):
+        """Publish each room's occupancy over the statistics window as sensors."""
+        del kwargs
+        window = self.constants["occupancy_statistics_window"]
+        for room_id, room in self.rooms.items():
+            self.set_state(
+                f"sensor.{room_id}_occupancy_statistics",
+                state=round(room.occupied_seconds(window) / 60),
+                attributes={
+                    "friendly_name": f"{room_id.replace('_', ' ').title()} "
+                    "Occupied Minutes",
+                    "unit_of_measurement": "min",
+                    "window_minutes": round(window / 60),
+                    "entries": room.entries(window),
+                    "mean_dwell_minutes": round(room.mean_dwell_time(window) / 60, 1),
+                },
+            )
 
     @property
     def anyone_home(self) -> bool:
@@ -206,6 +247,223 @@ class Presence(App):
             self.control.scene = "Night"
 
 
+class TimerWheel:
+    """Hashed timer wheel firing delayed callbacks from a single scheduler tick.
+
+    Deadlines are bucketed into slots by tick number (modulo the wheel size), so
+    scheduling, rescheduling and cancelling a handle are O(1) and callbacks that
+    fall due in the same tick are fired together. A single timer is kept set for
+    the earliest deadline, and only while there are any.
+    """
+
+    size = 512  # number of slots (deadlines further ahead wrap around the wheel)
+
+    def __init__(self, controller: Presence, resolution: float):
+        """Prepare an empty wheel that ticks every resolution seconds."""
+        self.controller = controller
+        self.resolution = resolution
+        self.slots: list[dict[int, tuple[int, Callable, str | None]]] = [
+            {} for _ in range(self.size)
+        ]
+        self.deadlines: dict[int, int] = {}
+        self.lock = threading.Lock()
+        self.current_tick = self.__tick_at(self.controller.now_ts)
+        self.timer = None
+        self.timer_tick = inf
+
+    def __tick_at(self, timestamp: float) -> int:
+        """Get the tick number of a timestamp."""
+        return int(timestamp // self.resolution)
+
+    def schedule(
+        self,
+        handle: int,
+        delay: float,
+        callback: Callable,
+        constrain_input_boolean: str | None = None,
+    ):
+        """Call back after a delay (replacing any deadline the handle already has)."""
+        now = self.controller.now_ts
+        deadline = max(
+            ceil((now + delay) / self.resolution),
+            self.__tick_at(now) + 1,
+        )
+        with self.lock:
+            self.__remove(handle)
+            self.deadlines[handle] = deadline
+            self.slots[deadline % self.size][handle] = (
+                deadline,
+                callback,
+                constrain_input_boolean,
+            )
+            if deadline < self.timer_tick:
+                self.__arm(deadline)
+
+    def cancel(self, handle: int):
+        """Cancel a handle's deadline (if it has one)."""
+        with self.lock:
+            self.__remove(handle)
+            if not self.deadlines:
+                self.__arm(inf)
+
+    def __arm(self, deadline: float):
+        """Set the timer for a tick, or clear it for inf (lock must be held)."""
+        if self.timer is not None:
+            self.controller.cancel_timer(self.timer)
+            self.timer = None
+        self.timer_tick = deadline
+        if deadline < inf:
+            self.timer = self.controller.run_in(
+                self.tick,
+                max(0, deadline * self.resolution - self.controller.now_ts),
+            )
+
+    def __remove(self, handle: int):
+        """Remove a handle's deadline from its slot (lock must be held)."""
+        deadline = self.deadlines.pop(handle, None)
+        if deadline is not None:
+            del self.slots[deadline % self.size][handle]
+
+    def __pop_due(self, now_tick: int) -> list[tuple[int, int, Callable, str | None]]:
+        """Remove the deadlines passed since the last tick (lock must be held)."""
+        due = []
+        if not self.deadlines:
+            return due
+        ticks = range(
+            max(self.current_tick + 1, now_tick - self.size + 1),
+            now_tick + 1,
+        )
+        for tick in ticks:
+            slot = self.slots[tick % self.size]
+            for handle in [
+                handle
+                for handle, (deadline, _, _) in slot.items()
+                if deadline <= now_tick
+            ]:
+                due.append((handle, *slot.pop(handle)))
+                del self.deadlines[handle]
+        return due
+
+    def tick(self, **kwargs: dict):
+        """Fire every callback whose deadline has passed, then re-arm the timer."""
+        del kwargs
+        now_tick = self.__tick_at(self.controller.now_ts)
+        with self.lock:
+            # The timer fired, so its tick has come (whatever float rounding says)
+            if self.timer_tick < inf:
+                now_tick = max(now_tick, int(self.timer_tick))
+            self.timer, self.timer_tick = None, inf
+            due = self.__pop_due(now_tick)
+            self.current_tick = now_tick
+            if self.deadlines:
+                self.__arm(min(self.deadlines.values()))
+        constraints = {}
+        for handle, _, callback, constrain_input_boolean in sorted(
+            due,
+            key=lambda entry: entry[1],
+        ):
+            if constrain_input_boolean:
+                if constrain_input_boolean not in constraints:
+                    entity_id, _, state = constrain_input_boolean.partition(",")
+                    constraints[constrain_input_boolean] = self.controller.get_state(
+                        entity_id,
+                    ) == (state or "on")
+                if not constraints[constrain_input_boolean]:
+                    continue
+            try:
+                callback()
+            except Exception:  # noqa: BLE001
+                self.controller.log(
+                    f"Error in timer wheel callback {handle}: "
+                    f"{traceback.format_exc()}",
+                    level="ERROR",
+                )
+
+
+class OccupancyHistory:
+    """Fixed size ring buffer of a room's presence transitions.
+
+    Each transition also stores the cumulative occupied seconds and entries up to
+    it, so statistics over a window are the difference between two binary
+    searches rather than a scan of the transitions within it.
+    """
+
+    def __init__(self, size: int):
+        """Allocate the (empty) buffer."""
+        self.size = size
+        self.times = array("d", bytes(8 * size))
+        self.occupied = array("b", bytes(size))
+        self.occupied_seconds = array("d", bytes(8 * size))
+        self.entries = array("q", bytes(8 * size))
+        self.start = 0
+        self.count = 0
+
+    def __index(self, position: int) -> int:
+        """Get the array index of a position (0 being the oldest transition)."""
+        return (self.start + position) % self.size
+
+    def record(self, timestamp: float, *, occupied: bool):
+        """Add a transition (ignored if occupancy has not changed)."""
+        if self.count:
+            last = self.__index(self.count - 1)
+            if self.occupied[last] == occupied:
+                return
+            occupied_seconds = self.occupied_seconds[last] + (
+                timestamp - self.times[last] if self.occupied[last] else 0
+            )
+            entries = self.entries[last] + occupied
+        else:
+            occupied_seconds, entries = 0.0, int(occupied)
+        if self.count == self.size:
+            self.start = self.__index(1)
+        else:
+            self.count += 1
+        index = self.__index(self.count - 1)
+        self.times[index] = timestamp
+        self.occupied[index] = occupied
+        self.occupied_seconds[index] = occupied_seconds
+        self.entries[index] = entries
+
+    def __position_at(self, timestamp: float) -> int:
+        """Get the position of the last transition at or before a time (else -1)."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[self.__index(middle)] <= timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+    def __totals_at(self, timestamp: float) -> tuple[float, int]:
+        """Get cumulative occupied seconds and entries (from the oldest transition)."""
+        if not self.count:
+            return 0.0, 0
+        index = self.__index(max(self.__position_at(timestamp), 0))
+        occupied_seconds = self.occupied_seconds[index]
+        if self.occupied[index] and timestamp > self.times[index]:
+            occupied_seconds += timestamp - self.times[index]
+        return occupied_seconds, self.entries[index]
+
+    def occupied_at(self, timestamp: float) -> bool:
+        """Check if the room was occupied at a time (vacant if before history)."""
+        position = self.__position_at(timestamp)
+        return position >= 0 and bool(self.occupied[self.__index(position)])
+
+    def occupied_seconds_between(self, start: float, end: float) -> float:
+        """Get the number of seconds the room was occupied between two times."""
+        return self.__totals_at(end)[0] - self.__totals_at(start)[0]
+
+    def entries_between(self, start: float, end: float) -> int:
+        """Get the number of times the room was entered between two times."""
+        return self.__totals_at(end)[1] - self.__totals_at(start)[1]
+
+    def mean_dwell_time_between(self, start: float, end: float) -> float:
+        """Get the mean seconds per occupancy period between two times."""
+        periods = self.entries_between(start, end) + self.occupied_at(start)
+        return self.occupied_seconds_between(start, end) / periods if periods else 0
+
+
 class Room:
     """Report on presence for an individual room."""
 
@@ -219,9 +477,7 @@ class Room:
             vacant = self.controller.get_state(sensor_id) == "off"
             last_changed = self.controller.convert_utc(
                 self.controller.get_state(sensor_id, attribute="last_changed"),
-            ).replace(tzinfo=None) + timedelta(
-                minutes=self.controller.get_tz_offset(),
-            )
+            ).timestamp()
         except ValueError:
             self.controller.notify(
                 f"Sensor in {room_id} is {self.controller.get_state(sensor_id)}",
@@ -233,9 +489,13 @@ class Room:
                 level="WARNING",
             )
             vacant = True
-            last_changed = self.controller.datetime()
-        self.last_vacated = last_changed - timedelta(hours=0 if vacant else 2)
-        self.last_entered = last_changed - timedelta(hours=2 if vacant else 0)
+            last_changed = self.controller.now_ts
+        self.last_vacated_ts = last_changed - (0 if vacant else 7200)
+        self.last_entered_ts = last_changed - (7200 if vacant else 0)
+        self.history = OccupancyHistory(
+            self.controller.constants["occupancy_history_size"],
+        )
+        self.history.record(last_changed, occupied=not vacant)
         self.callbacks = {}
         self.controller.listen_state(self.handle_presence_change, sensor_id)
         presence_message = "vacated" if vacant else "entered"
@@ -246,23 +506,50 @@ class Room:
                 level="DEBUG",
             )
 
+    @property
+    def last_entered(self) -> datetime:
+        """Local time the room was last entered."""
+        return self.__local_datetime(self.last_entered_ts)
+
+    @property
+    def last_vacated(self) -> datetime:
+        """Local time the room was last vacated."""
+        return self.__local_datetime(self.last_vacated_ts)
+
+    def __local_datetime(self, timestamp: float) -> datetime:
+        """Convert a timestamp to a (naive) local datetime like AppDaemon's."""
+        return datetime.fromtimestamp(timestamp, UTC).replace(tzinfo=None) + timedelta(
+            minutes=self.controller.get_tz_offset(),
+        )
+
     def is_vacant(self, vacating_delay: float = 0) -> bool:
         """Check if vacant based on last time vacated/entered, with optional delay."""
         return (
-            self.last_entered
-            < self.last_vacated
-            < self.controller.datetime() - timedelta(seconds=vacating_delay)
+            self.last_entered_ts
+            < self.last_vacated_ts
+            <= self.controller.now_ts - vacating_delay
         )
 
     def seconds_in_room(self, vacating_delay: float = 0) -> float:
         """Return number of seconds room has been occupied (or vacant if negative)."""
-        return (
-            self.last_vacated
-            - self.controller.datetime()
-            + timedelta(seconds=vacating_delay)
-            if self.is_vacant(vacating_delay)
-            else self.controller.datetime() - self.last_entered
-        ).total_seconds()
+        if self.is_vacant(vacating_delay):
+            return self.last_vacated_ts - self.controller.now_ts + vacating_delay
+        return self.controller.now_ts - self.last_entered_ts
+
+    def occupied_seconds(self, window: float) -> float:
+        """Get the number of seconds occupied over the last window of seconds."""
+        now = self.controller.now_ts
+        return self.history.occupied_seconds_between(now - window, now)
+
+    def entries(self, window: float) -> int:
+        """Get the number of times entered over the last window of seconds."""
+        now = self.controller.now_ts
+        return self.history.entries_between(now - window, now)
+
+    def mean_dwell_time(self, window: float) -> float:
+        """Get the mean seconds per occupancy over the last window of seconds."""
+        now = self.controller.now_ts
+        return self.history.mean_dwell_time_between(now - window, now)
 
     def handle_presence_change(
         self,
@@ -295,10 +582,12 @@ class Room:
                     level="DEBUG",
                 )
                 return
-            self.last_vacated = self.controller.datetime()
+            self.last_vacated_ts = self.controller.now_ts
+            self.history.record(self.last_vacated_ts, occupied=False)
         else:
-            reentry = self.last_entered > self.last_vacated
-            self.last_entered = self.controller.datetime()
+            reentry = self.last_entered_ts > self.last_vacated_ts
+            self.last_entered_ts = self.controller.now_ts
+            self.history.record(self.last_entered_ts, occupied=True)
             if "Away" in self.controller.control.scene:
                 if "_person_detected" in entity:
                     self.controller.notify(
@@ -336,19 +625,21 @@ class Room:
                 f"The '{self.room_id}' is now '{'vacant' if vacant else 'occupied'}'",
                 level="DEBUG",
             )
+        timer_wheel = self.controller.timer_wheel
         for handle, callback in list(self.callbacks.items()):
-            self.controller.cancel_timer(callback["timer_handle"])
             if not vacant or callback["vacating_delay"] == 0:
+                timer_wheel.cancel(handle)
                 callback["callback"]()
                 self.controller.log(
                     f"Callback {handle} triggered by '{entity}'",
                     level="DEBUG",
                 )
             else:
-                self.callbacks[handle]["timer_handle"] = self.controller.run_in(
-                    callback["callback"],
+                timer_wheel.schedule(
+                    handle,
                     callback["vacating_delay"],
-                    constrain_input_boolean=callback["control_input_boolean"],
+                    callback["callback"],
+                    callback["control_input_boolean"],
                 )
                 self.controller.log(
                     f"Set vacation timer for callback: {handle}",
@@ -366,20 +657,20 @@ class Room:
         callback,
         vacating_delay: float,
         control_input_boolean: str,
-    ) -> uuid.UUID:
+    ) -> int:
         """Register a callback for when presence changes, with an optional delay."""
-        handle = uuid.uuid4().hex
+        handle = next(self.controller.callback_handles)
         self.callbacks[handle] = {
             "callback": callback,
             "vacating_delay": vacating_delay,
-            "timer_handle": None,
             "control_input_boolean": control_input_boolean,
         }
         if 0 < -1 * self.seconds_in_room() < vacating_delay:
-            self.callbacks[handle]["timer_handle"] = self.controller.run_in(
-                callback,
+            self.controller.timer_wheel.schedule(
+                handle,
                 vacating_delay + self.seconds_in_room(),
-                constrain_input_boolean=control_input_boolean,
+                callback,
+                control_input_boolean,
             )
 
         self.controller.log(
@@ -388,10 +679,10 @@ class Room:
         )
         return handle
 
-    def cancel_callback(self, handle):
+    def cancel_callback(self, handle: int):
         """Cancel a callback (and its timer if it has one) by passing its handle."""
         if handle in self.callbacks:
-            self.controller.cancel_timer(self.callbacks[handle]["timer_handle"])
+            self.controller.timer_wheel.cancel(handle)
             del self.callbacks[handle]
 
 
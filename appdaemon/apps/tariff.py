@@ -0,0 +1,211 @@
+"""Cost climate device runs against a time-of-use electricity tariff.
+
+Rates apply over periods of the local day (such as peak and off-peak), with a
+base rate (the provider's usage charge) outside of them. Device power is
+estimated the way powercalc does, so runs can be costed as power x duration x
+rate integrated across tariff periods, and the cheapest run that has a room at
+target by a deadline can be chosen from a room's thermal model.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from bisect import bisect_left
+from itertools import pairwise
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from thermal import ThermalModel
+
+DAY = 86400
+WATT_SECONDS_PER_KWH = 3.6e6
+COST_TOLERANCE = 1e-4  # $, within which runs nearer the deadline are preferred
+
+
+def seconds_of_day(time: str | float) -> float:
+    """Convert a time of day ("HH:MM:SS" or seconds after midnight) to seconds."""
+    if isinstance(time, int | float):
+        return float(time)
+    parsed = dt.time.fromisoformat(time)
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def aircon_power(difference: float, max_difference: float) -> float:
+    """Estimate aircon power (W) as powercalc's aircon_power template does.
+
+    Both the compressor and the fan (on auto) scale with the degrees the room is
+    off target, up to max_difference.
+    """
+    fraction = max(0.0, min(1.0, difference / max_difference))
+    return 200 + 920 * fraction + 50 + 100 * max(0.1, fraction)
+
+
+class Tariff:
+    """Electricity rates ($/kWh) by time of day."""
+
+    def __init__(
+        self,
+        periods: Iterable[dict] = (),
+        base_rate: float = 0.0,
+        tz_offset: float = 0.0,
+    ):
+        """Load periods (start, end, rate) in local time, offset minutes from UTC.
+
+        Periods ending before they start wrap past midnight. The first period
+        containing a time sets its rate.
+        """
+        self.periods = [
+            (seconds_of_day(period["start"]), seconds_of_day(period["end"]), rate)
+            for period in periods
+            if (rate := period.get("rate")) is not None
+        ]
+        self.base_rate = base_rate
+        self.offset = tz_offset * 60
+        self.edges = sorted(
+            {edge for start, end, _ in self.periods for edge in (start, end)},
+        )
+
+    def rate_at(self, timestamp: float) -> float:
+        """Get the rate at a time."""
+        local = (timestamp + self.offset) % DAY
+        for start, end, rate in self.periods:
+            if start <= local < end if start < end else local >= start or local < end:
+                return rate
+        return self.base_rate
+
+    def boundaries(self, start: float, end: float) -> list[float]:
+        """Get the times between start and end at which the rate may change."""
+        day = start - (start + self.offset) % DAY
+        times = []
+        while day < end:
+            times.extend(
+                day + edge for edge in self.edges if start < day + edge < end
+            )
+            day += DAY
+        return times
+
+
+class Run(NamedTuple):
+    """A simulated device run and the room temperatures it results in."""
+
+    start: float
+    end: float
+    predicted: float
+    lowest: float
+    highest: float
+    cost: float
+
+
+class Optimizer:
+    """Find the cheapest run of a device that has its room at target by a deadline.
+
+    The time up to the deadline is split into segments at run step, forecast
+    and tariff boundaries, each with a constant outside temperature and rate.
+    Runs start and end on segment boundaries, so they may end early and let the
+    room coast to the deadline, for example pre-cooling while rates are cheap.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        model: ThermalModel,
+        tariff: Tariff,
+        temperature: float,
+        *,
+        now: float,
+        deadline: float,
+        earliest: float,
+        step: float,
+        boundaries: Iterable[float],
+        outside_at: Callable[[float], float],
+    ):
+        """Segment the time from now to the deadline, starting runs from earliest."""
+        self.model = model
+        self.temperature = temperature
+        grid = [
+            deadline - step * index
+            for index in range(int((deadline - now) // step) + 1)
+        ]
+        times = sorted(
+            {
+                time
+                for time in (now, *grid, *boundaries, *tariff.boundaries(now, deadline))
+                if now <= time <= deadline
+            },
+        )
+        self.segments = [
+            (earlier, later - earlier, outside_at(earlier), tariff.rate_at(earlier))
+            for earlier, later in pairwise(times)
+        ]
+        self.starts = times[bisect_left(times, max(now, earliest)) :]
+
+    def simulate(
+        self,
+        start: float,
+        end: float,
+        mode: str | None = None,
+        power: Callable[[float], float] = lambda _: 0.0,
+    ) -> Run:
+        """Predict the room and cost of running from start to end in a mode."""
+        temperature = lowest = highest = self.temperature
+        cost = 0.0
+        for time, seconds, outside, rate in self.segments:
+            running = mode is not None and start <= time < end
+            if running:
+                cost += power(temperature) * seconds / WATT_SECONDS_PER_KWH * rate
+            temperature = self.model.predict(
+                temperature,
+                outside,
+                seconds,
+                heating=running and mode == "heat",
+                cooling=running and mode == "cool",
+            )
+            lowest, highest = min(lowest, temperature), max(highest, temperature)
+        return Run(start, end, temperature, lowest, highest, cost)
+
+    def cheapest(
+        self,
+        mode: str,
+        target: float,
+        limit: float,
+        power: Callable[[float], float],
+    ) -> tuple[Run, Run]:
+        """Get the cheapest and the latest runs reaching target by the deadline.
+
+        Cooling must not take the room below the limit at any point (or heating
+        above it). For each end the shortest run reaching target is the cheapest,
+        and is found by bisection as longer runs only take the room further. If
+        no run reaches target the longest run up to the deadline is returned.
+        """
+        sign = 1 if mode == "heat" else -1
+
+        def reached(run: Run) -> bool:
+            return sign * (run.predicted - target) >= 0
+
+        def comfortable(run: Run) -> bool:
+            extreme = run.highest if mode == "heat" else run.lowest
+            return sign * (limit - extreme) >= 0
+
+        starts = self.starts
+        latest = self.simulate(starts[0], starts[-1], mode, power)
+        best = None
+        for end_index in range(len(starts) - 1, 0, -1):
+            end = starts[end_index]
+            if not reached(self.simulate(starts[0], end, mode, power)):
+                continue
+            low, high = 0, end_index - 1
+            while low < high:
+                middle = (low + high + 1) // 2
+                if reached(self.simulate(starts[middle], end, mode, power)):
+                    low = middle
+                else:
+                    high = middle - 1
+            run = self.simulate(starts[low], end, mode, power)
+            if end_index == len(starts) - 1:
+                latest = run
+            if comfortable(run) and (
+                best is None or run.cost < best.cost - COST_TOLERANCE
+            ):
+                best = run
+        return best or latest, latest
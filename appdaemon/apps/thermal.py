@@ -0,0 +1,261 @@
+"""Learn how a room's temperature responds to outside, climate devices and doors.
+
+Each model is a first-order (Newton's law of cooling) fit from recorded history:
+
+    dT/dt = (loss + door_loss * door) * (outside - T)
+            + heating * heat + cooling * cool + gain
+
+where door/heat/cool are 0 or 1 and gain covers people, appliances and the sun.
+Being linear in its coefficients it is fitted by least squares over regularly
+resampled history, and its closed form solution predicts the temperature ahead
+of time and how long a device would take to reach a target.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import math
+from bisect import bisect_right
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+FEATURES = ("loss", "door_loss", "heating", "cooling", "gain")
+RIDGE = 1e-9  # keeps the normal equations solvable when a device never ran
+
+
+def features(
+    temperature: float,
+    outside: float,
+    *,
+    heating: bool = False,
+    cooling: bool = False,
+    door: bool = False,
+) -> tuple[float, ...]:
+    """Get the model inputs for a room's conditions (ordered as FEATURES)."""
+    difference = outside - temperature
+    return (difference, difference if door else 0.0, float(heating), float(cooling), 1)
+
+
+def solve(matrix: list[list[float]], vector: list[float]) -> list[float] | None:
+    """Solve a small linear system by Gaussian elimination (None if singular)."""
+    size = len(vector)
+    rows = [[*row, value] for row, value in zip(matrix, vector, strict=True)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda row: abs(rows[row][column]))
+        if abs(rows[pivot][column]) < 1e-15:  # noqa: PLR2004
+            return None
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for row in range(column + 1, size):
+            factor = rows[row][column] / rows[column][column]
+            for index in range(column, size + 1):
+                rows[row][index] -= factor * rows[column][index]
+    solution = [0.0] * size
+    for row in reversed(range(size)):
+        solution[row] = (
+            rows[row][size]
+            - sum(rows[row][index] * solution[index] for index in range(row + 1, size))
+        ) / rows[row][row]
+    return solution
+
+
+class History:
+    """A recorded entity's state changes, looked up as of any time."""
+
+    def __init__(self, changes: Iterable[dict]):
+        """Index state changes from AppDaemon's get_history by time."""
+        self.times: list[float] = []
+        self.states: list[str] = []
+        for change in changes:
+            changed = change["last_changed"]
+            if isinstance(changed, str):
+                changed = dt.datetime.fromisoformat(changed)
+            self.times.append(changed.timestamp())
+            self.states.append(change["state"])
+
+    def state_at(self, timestamp: float) -> str | None:
+        """Get the state as of a time (None before the first change)."""
+        index = bisect_right(self.times, timestamp) - 1
+        return self.states[index] if index >= 0 else None
+
+    def value_at(self, timestamp: float) -> float | None:
+        """Get the numeric state as of a time (None if unavailable)."""
+        try:
+            return float(self.state_at(timestamp))
+        except (TypeError, ValueError):
+            return None
+
+
+class RoomHistory(NamedTuple):
+    """Recorded histories a room's thermal model is fitted from."""
+
+    temperatures: list[History]
+    outside: History
+    device: History
+    doors: list[History]
+
+
+class ThermalModel:
+    """First-order thermal model of a room fitted from its history."""
+
+    def __init__(self, minimum_samples: int = 100):
+        """Start unfitted, requiring enough samples before predicting."""
+        self.minimum_samples = minimum_samples
+        self.coefficients: dict[str, float] = {}
+        self.samples = 0
+        self.rmse: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        """Check the model has been fitted with a physically plausible result."""
+        return bool(self.coefficients) and self.coefficients["loss"] > 0
+
+    def fit(self, samples: Iterable[tuple[tuple[float, ...], float]]) -> bool:
+        """Fit coefficients to (features, rate of change per second) samples.
+
+        The normal equations are accumulated in a single pass, so samples can be
+        a generator. Returns whether the fit is ready to use.
+        """
+        size = len(FEATURES)
+        gram = [[0.0] * size for _ in range(size)]
+        moments = [0.0] * size
+        squares = 0.0
+        count = 0
+        for inputs, rate in samples:
+            count += 1
+            squares += rate * rate
+            for row in range(size):
+                moments[row] += inputs[row] * rate
+                for column in range(row, size):
+                    gram[row][column] += inputs[row] * inputs[column]
+        if count < self.minimum_samples:
+            return False
+        for row in range(size):
+            for column in range(row):
+                gram[row][column] = gram[column][row]
+        solution = solve(
+            [
+                [
+                    value + (RIDGE * count if row == column else 0)
+                    for column, value in enumerate(values)
+                ]
+                for row, values in enumerate(gram)
+            ],
+            moments,
+        )
+        if solution is None:
+            return False
+        self.coefficients = dict(zip(FEATURES, solution, strict=True))
+        self.samples = count
+        # Residual sum of squares from the accumulated sums: y'y - 2b'X'y + b'X'Xb
+        residual = (
+            squares
+            - 2 * sum(b * m for b, m in zip(solution, moments, strict=True))
+            + sum(
+                solution[row] * gram[row][column] * solution[column]
+                for row in range(size)
+                for column in range(size)
+            )
+        )
+        self.rmse = math.sqrt(max(residual, 0) / count)
+        return self.ready
+
+    def fit_history(
+        self,
+        history: RoomHistory,
+        start: float,
+        end: float,
+        period: float,
+    ) -> bool:
+        """Fit from recorded histories resampled every period seconds.
+
+        The room temperature is the average of its sensors, the device heats in
+        the 'heat' or 'on' states and cools in 'cool', and the door counts as open
+        if any of the doors are. Intervals with unavailable readings are skipped.
+        """
+
+        def conditions(timestamp: float) -> tuple[float, tuple[float, ...]] | None:
+            readings = [sensor.value_at(timestamp) for sensor in history.temperatures]
+            outside_temperature = history.outside.value_at(timestamp)
+            if None in readings or outside_temperature is None:
+                return None
+            temperature = sum(readings) / len(readings)
+            state = history.device.state_at(timestamp)
+            return temperature, features(
+                temperature,
+                outside_temperature,
+                heating=state in ("heat", "on"),
+                cooling=state == "cool",
+                door=any(door.state_at(timestamp) == "on" for door in history.doors),
+            )
+
+        def samples() -> Iterable[tuple[tuple[float, ...], float]]:
+            previous = conditions(start)
+            for step in range(1, int((end - start) // period) + 1):
+                current = conditions(start + step * period)
+                if previous is not None and current is not None:
+                    yield previous[1], (current[0] - previous[0]) / period
+                previous = current
+
+        return self.fit(samples())
+
+    def rate(self, temperature: float, outside: float, **kwargs: bool) -> float:
+        """Predict the rate of temperature change (degrees per second)."""
+        return sum(
+            self.coefficients[name] * value
+            for name, value in zip(
+                FEATURES,
+                features(temperature, outside, **kwargs),
+                strict=True,
+            )
+        )
+
+    def __response(
+        self,
+        outside: float,
+        *,
+        heating: bool = False,
+        cooling: bool = False,
+        door: bool = False,
+    ) -> tuple[float, float]:
+        """Get the decay rate and equilibrium temperature for given conditions."""
+        coefficients = self.coefficients
+        decay = coefficients["loss"] + (coefficients["door_loss"] if door else 0)
+        drive = (
+            coefficients["gain"]
+            + (coefficients["heating"] if heating else 0)
+            + (coefficients["cooling"] if cooling else 0)
+        )
+        return decay, outside + drive / decay if decay > 0 else math.nan
+
+    def predict(
+        self,
+        temperature: float,
+        outside: float,
+        seconds: float,
+        **kwargs: bool,
+    ) -> float:
+        """Predict the temperature after some seconds with conditions unchanged."""
+        decay, equilibrium = self.__response(outside, **kwargs)
+        if decay <= 0:
+            return temperature + self.rate(temperature, outside, **kwargs) * seconds
+        return equilibrium + (temperature - equilibrium) * math.exp(-decay * seconds)
+
+    def seconds_to_reach(
+        self,
+        temperature: float,
+        target: float,
+        outside: float,
+        **kwargs: bool,
+    ) -> float:
+        """Predict seconds until a target is reached (infinite if it never will)."""
+        if temperature == target:
+            return 0.0
+        decay, equilibrium = self.__response(outside, **kwargs)
+        if decay <= 0:
+            rate = self.rate(temperature, outside, **kwargs)
+            seconds = (target - temperature) / rate if rate else math.inf
+            return seconds if seconds >= 0 else math.inf
+        remaining = (target - equilibrium) / (temperature - equilibrium)
+        return -math.log(remaining) / decay if 0 < remaining < 1 else math.inf
@@ -0,0 +1,15 @@
+"""Offline simulation of Home Assistant for replaying history through the apps."""
+
+from .hass import Entity, ServiceCall, SimulatedHass, Simulation
+from .replay import Replay, load_app_configs, load_states, read_events
+
+__all__ = [
+    "Entity",
+    "Replay",
+    "ServiceCall",
+    "SimulatedHass",
+    "Simulation",
+    "load_app_configs",
+    "load_states",
+    "read_events",
+]
@@ -0,0 +1,126 @@
+"""Replay recorded history through the apps and report decision throughput.
+
+Run from the appdaemon directory, for example:
+
+    python -m simulation history.csv --states states.json --record calls.jsonl
+
+Exits non-zero if any app fails to initialise, any callback raises, or the
+service calls differ from those expected.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+import yaml
+
+from .hass import Simulation
+from .replay import Replay, load_app_configs, load_states, read_events
+
+APPS_DIR = Path(__file__).parent.parent / "apps"
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(prog="python -m simulation")
+    parser.add_argument(
+        "history",
+        nargs="+",
+        type=Path,
+        help="state history as CSV (entity_id,state,last_changed) or influx lines",
+    )
+    parser.add_argument("--states", type=Path, help="initial /api/states dump")
+    parser.add_argument("--secrets", type=Path, help="secrets.yaml for app configs")
+    parser.add_argument(
+        "--apps",
+        nargs="+",
+        default=["Control", "Presence", "Lights", "Climate"],
+        help="apps to run (dependencies are added)",
+    )
+    parser.add_argument(
+        "--set",
+        nargs="+",
+        default=[],
+        metavar="APP.KEY=VALUE",
+        help="override app config values (values are parsed as yaml)",
+    )
+    parser.add_argument(
+        "--tz-offset",
+        type=float,
+        default=0,
+        help="local timezone offset from UTC in minutes",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=0,
+        help="seconds to keep running timers after the last event",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="number of times to replay (for benchmarking)",
+    )
+    parser.add_argument(
+        "--track",
+        nargs="+",
+        default=[],
+        metavar="ENTITY_ID",
+        help="report entities' final states and attributes (such as app decisions)",
+    )
+    parser.add_argument("--record", type=Path, help="write service calls (jsonl)")
+    parser.add_argument(
+        "--expect",
+        type=Path,
+        help="fail if service calls differ from an earlier --record",
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Replay history through the apps, report, then record or compare calls."""
+    args = parse_args()
+    logging.basicConfig(level=args.log_level, format="%(name)s %(message)s")
+    sys.path.insert(0, str(APPS_DIR))
+    Simulation.install()
+    secrets = {}
+    if args.secrets:
+        with args.secrets.open(encoding="utf-8") as file:
+            secrets = yaml.safe_load(file)
+    configs = load_app_configs(APPS_DIR, args.apps, secrets)
+    for override in args.set:
+        key, value = override.split("=", 1)
+        app, key = key.split(".", 1)
+        configs[app][key] = yaml.safe_load(value)
+    events = read_events(args.history)
+    if not events:
+        sys.stderr.write("No state changes found in history\n")
+        return 1
+    states = load_states(args.states)
+
+    failed = False
+    for _ in range(args.repeat):
+        simulation = Simulation(states, events[0][0], args.tz_offset)
+        simulation.load_apps(configs)
+        replay = Replay(simulation, events)
+        replay.run(args.settle)
+        sys.stdout.write(json.dumps(replay.report(args.track), default=str) + "\n")
+        simulation.terminate()
+        failed = failed or simulation.errors > 0
+
+    if args.record:
+        replay.write_calls(args.record)
+    if args.expect:
+        differences = replay.compare_calls(args.expect)
+        for difference in differences:
+            sys.stderr.write(difference + "\n")
+        failed = failed or bool(differences)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
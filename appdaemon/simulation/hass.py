@@ -0,0 +1,958 @@
+"""In-process stand-in for AppDaemon's Home Assistant API.
+
+Runs the real apps against a virtual clock, an in-memory entity store and a
+service call recorder, so automation behaviour can be replayed and benchmarked
+without AppDaemon or Home Assistant.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import heapq
+import itertools
+import logging
+import sys
+import types
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+LISTENER_OPTIONS = (
+    "attribute",
+    "new",
+    "old",
+    "duration",
+    "immediate",
+    "namespace",
+    "constrain_input_boolean",
+    "oneshot",
+)
+
+
+@dataclass
+class ServiceCall:
+    """A service call made by an app, as recorded by the simulation."""
+
+    time: float
+    app: str
+    service: str
+    data: dict
+
+    def as_dict(self) -> dict:
+        """Return a JSON serialisable form of the call."""
+        return {
+            "time": self.time,
+            "app": self.app,
+            "service": self.service,
+            "data": self.data,
+        }
+
+
+@dataclass(order=True)
+class Timer:
+    """A scheduled callback on the virtual clock."""
+
+    when: float
+    handle: int
+    app: SimulatedHass = field(compare=False)
+    callback: Callable = field(compare=False)
+    kwargs: dict = field(compare=False)
+    interval: float = field(default=0, compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+@dataclass
+class StateListener:
+    """A registered state callback and its filters."""
+
+    handle: int
+    app: SimulatedHass
+    callback: Callable
+    entity: str | None
+    options: dict
+    kwargs: dict
+    duration_timer: Timer | None = None
+
+
+class StateView(dict):
+    """State dictionary that also allows attribute access (like AppDaemon's)."""
+
+    def __getattr__(self, name: str) -> Any:
+        """Get a top level value (e.g. state) or an entity attribute."""
+        if name in self:
+            return self[name]
+        return self.get("attributes", {}).get(name)
+
+
+class DomainAccess:
+    """Access entities of one domain by object id (self.entities.<domain>)."""
+
+    def __init__(self, simulation: Simulation, domain: str):
+        """Bind to a domain in the simulation's entity store."""
+        self._simulation = simulation
+        self._domain = domain
+
+    def __getattr__(self, object_id: str) -> StateView:
+        """Get the current state of an entity in this domain."""
+        return StateView(self._simulation.states[f"{self._domain}.{object_id}"])
+
+    def items(self) -> list[tuple[str, StateView]]:
+        """Get (object id, state) pairs for every entity in this domain."""
+        return [
+            (entity_id.split(".", 1)[1], StateView(state))
+            for entity_id, state in self._simulation.states.items()
+            if entity_id.startswith(f"{self._domain}.")
+        ]
+
+    def values(self) -> list[StateView]:
+        """Get the state of every entity in this domain."""
+        return [state for _, state in self.items()]
+
+
+class EntityAccess:
+    """Access entities by domain (self.entities)."""
+
+    def __init__(self, simulation: Simulation):
+        """Bind to the simulation's entity store."""
+        self._simulation = simulation
+
+    def __getattr__(self, domain: str) -> DomainAccess:
+        """Get access to the entities of a domain."""
+        return DomainAccess(self._simulation, domain)
+
+
+class Entity:
+    """Stand-in for AppDaemon's Entity object."""
+
+    def __init__(self, app: SimulatedHass, entity_id: str):
+        """Bind to an entity in the simulation's entity store."""
+        self.app = app
+        self.entity_id = entity_id
+        self.domain = entity_id.split(".", 1)[0]
+
+    @property
+    def state(self) -> str | None:
+        """Get the entity's state."""
+        return self.app.get_state(self.entity_id)
+
+    @property
+    def attributes(self) -> dict:
+        """Get the entity's attributes."""
+        return self.app.get_state(self.entity_id, attribute="all")["attributes"]
+
+    @property
+    def friendly_name(self) -> str:
+        """Get the entity's friendly name (or its id if none is set)."""
+        return self.attributes.get("friendly_name", self.entity_id)
+
+    @property
+    def last_changed_seconds(self) -> float:
+        """Get the number of seconds since the entity's state last changed."""
+        simulation = self.app.simulation
+        return simulation.now_ts - simulation.states[self.entity_id]["_changed_ts"]
+
+    def get_state(self, attribute: str | None = None) -> Any:
+        """Get the entity's state or one of its attributes."""
+        return self.app.get_state(self.entity_id, attribute=attribute)
+
+    def turn_on(self, **kwargs: dict):
+        """Turn the entity on."""
+        self.call_service("turn_on", **kwargs)
+
+    def turn_off(self, **kwargs: dict):
+        """Turn the entity off."""
+        self.call_service("turn_off", **kwargs)
+
+    def call_service(self, service: str, **kwargs: dict):
+        """Call one of the entity's domain services."""
+        return self.app.call_service(
+            f"{self.domain}/{service}",
+            entity_id=self.entity_id,
+            **kwargs,
+        )
+
+
+class SimulatedHass:
+    """Drop-in replacement for hassapi.Hass backed by a Simulation."""
+
+    def __init__(self, simulation: Simulation, name: str, args: dict):
+        """Register the app with the simulation."""
+        self.simulation = simulation
+        self.name = name
+        self.args = args
+        self.logger = logging.getLogger(f"simulation.{name}")
+        self.logger.setLevel(args.get("log_level", "INFO"))
+        self.entities = EntityAccess(simulation)
+
+    def initialize(self):
+        """Override in the app."""
+
+    def terminate(self):
+        """Override in the app."""
+
+    def log(self, message: str, level: str = "INFO", **kwargs: dict):
+        """Log a message and pass it on to any log listeners."""
+        del kwargs
+        self.logger.log(LEVELS[level], message)
+        if LEVELS[level] >= LEVELS["INFO"]:
+            self.simulation.emit_log(self.name, level, "main_log", message)
+
+    def error(self, message: str, level: str = "WARNING", **kwargs: dict):
+        """Log a message to the error log."""
+        del kwargs
+        self.logger.log(LEVELS[level], message)
+        self.simulation.emit_log(self.name, level, "error_log", message)
+
+    def get_app(self, name: str) -> SimulatedHass:
+        """Get another app by name."""
+        return self.simulation.apps[name]
+
+    def get_state(
+        self,
+        entity_id: str | None = None,
+        attribute: str | None = None,
+        default: Any = None,
+        copy: bool = True,  # noqa: FBT002
+        **kwargs: dict,
+    ) -> Any:
+        """Get the state of an entity, a domain or everything."""
+        del copy, kwargs
+        states = self.simulation.states
+        if entity_id is None:
+            return {key: self.simulation.public_state(key) for key in states}
+        if "." not in entity_id:
+            return {
+                key: self.simulation.public_state(key)
+                for key in states
+                if key.startswith(f"{entity_id}.")
+            }
+        if entity_id not in states:
+            return default
+        value = self.simulation.value(entity_id, attribute)
+        return default if value is None else value
+
+    def set_state(
+        self,
+        entity_id: str,
+        state: str | None = None,
+        attributes: dict | None = None,
+        **kwargs: dict,
+    ):
+        """Set the state (and optionally attributes) of an entity."""
+        del kwargs
+        self.simulation.set_state(entity_id, state, attributes)
+
+    def entity_exists(self, entity_id: str) -> bool:
+        """Check if an entity exists."""
+        return entity_id in self.simulation.states
+
+    def get_entity(self, entity_id: str) -> Entity:
+        """Get an entity object."""
+        return Entity(self, entity_id)
+
+    @staticmethod
+    def split_entity(entity_id: str) -> list[str]:
+        """Split an entity id into domain and object id."""
+        return entity_id.split(".", 1)
+
+    def call_service(self, service: str, **kwargs: dict) -> dict | None:
+        """Record a service call, apply its effect and return any response."""
+        kwargs.pop("return_result", None)
+        kwargs.pop("namespace", None)
+        return self.simulation.call_service(self.name, service, kwargs)
+
+    def turn_on(self, entity_id: str, **kwargs: dict):
+        """Turn an entity on."""
+        self.call_service(
+            f"{self.split_entity(entity_id)[0]}/turn_on",
+            entity_id=entity_id,
+            **kwargs,
+        )
+
+    def turn_off(self, entity_id: str, **kwargs: dict):
+        """Turn an entity off."""
+        self.call_service(
+            f"{self.split_entity(entity_id)[0]}/turn_off",
+            entity_id=entity_id,
+            **kwargs,
+        )
+
+    def notify(self, message: str, **kwargs: dict):
+        """Send a notification through the recorded notify service."""
+        self.call_service(
+            f"notify/{kwargs.pop('name', 'notify')}",
+            message=message,
+            **kwargs,
+        )
+
+    def fire_event(self, event: str, **kwargs: dict):
+        """Fire an event to any event listeners."""
+        self.simulation.fire_event(event, **kwargs)
+
+    def set_production_mode(self, mode: bool = True):  # noqa: FBT002
+        """Accept but ignore production mode changes."""
+        del mode
+
+    def get_history(self, entity_id: str, **kwargs: dict) -> list[list[dict]]:
+        """Get the recorded history of an entity (start_time/end_time/days)."""
+        return [self.simulation.history(entity_id, **kwargs)]
+
+    # Listeners
+
+    def listen_state(
+        self,
+        callback: Callable,
+        entity_id: str | None = None,
+        **kwargs: dict,
+    ) -> int:
+        """Register a callback for state changes matching the given filters."""
+        options = {key: kwargs.pop(key) for key in LISTENER_OPTIONS if key in kwargs}
+        listener = StateListener(
+            self.simulation.next_handle(),
+            self,
+            callback,
+            entity_id,
+            options,
+            kwargs,
+        )
+        self.simulation.state_listeners[listener.handle] = listener
+        if options.get("immediate"):
+            self.simulation.trigger_immediate(listener)
+        return listener.handle
+
+    def cancel_listen_state(self, handle: int):
+        """Cancel a state callback."""
+        self.simulation.state_listeners.pop(handle, None)
+
+    def listen_event(self, callback: Callable, event: str, **kwargs: dict) -> int:
+        """Register a callback for an event with optional data filters."""
+        kwargs.pop("namespace", None)
+        handle = self.simulation.next_handle()
+        self.simulation.event_listeners[handle] = (self, callback, event, kwargs)
+        return handle
+
+    def cancel_listen_event(self, handle: int):
+        """Cancel an event callback."""
+        self.simulation.event_listeners.pop(handle, None)
+
+    def listen_log(self, callback: Callable, **kwargs: dict) -> int:
+        """Register a callback for messages logged by any app."""
+        del kwargs
+        handle = self.simulation.next_handle()
+        self.simulation.log_listeners[handle] = (self, callback)
+        return handle
+
+    def cancel_listen_log(self, handle: int | Callable):
+        """Cancel a log callback (by handle or callback)."""
+        for key, (_, callback) in list(self.simulation.log_listeners.items()):
+            if handle in (key, callback):
+                del self.simulation.log_listeners[key]
+
+    # Scheduler
+
+    def run_in(self, callback: Callable, delay: float, **kwargs: dict) -> Timer:
+        """Run a callback after a delay in seconds."""
+        return self.simulation.schedule(
+            self,
+            callback,
+            self.simulation.now_ts + delay,
+            kwargs,
+        )
+
+    def run_at(self, callback: Callable, start: dt.datetime, **kwargs: dict):
+        """Run a callback at a given local time."""
+        return self.simulation.schedule(
+            self,
+            callback,
+            self.simulation.to_ts(start),
+            kwargs,
+        )
+
+    def run_every(
+        self,
+        callback: Callable,
+        start: str | dt.datetime,
+        interval: float,
+        **kwargs: dict,
+    ) -> Timer:
+        """Run a callback repeatedly, starting now(+seconds) or at a local time."""
+        when = (
+            self.simulation.now_ts + float(start.removeprefix("now").lstrip("+") or 0)
+            if isinstance(start, str) and start.startswith("now")
+            else self.simulation.to_ts(self.parse_datetime(start))
+        )
+        return self.simulation.schedule(self, callback, when, kwargs, interval)
+
+    def run_daily(
+        self,
+        callback: Callable,
+        start: str | dt.time,
+        **kwargs: dict,
+    ) -> Timer:
+        """Run a callback every day at the given local time."""
+        when = dt.datetime.combine(self.date(), self.parse_time(start))
+        if when <= self.datetime():
+            when += dt.timedelta(days=1)
+        return self.simulation.schedule(
+            self,
+            callback,
+            self.simulation.to_ts(when),
+            kwargs,
+            86400,
+        )
+
+    def cancel_timer(self, handle: Timer | None, silent: bool = False):  # noqa: FBT002
+        """Cancel a scheduled callback."""
+        del silent
+        if handle is not None:
+            handle.cancelled = True
+
+    def timer_running(self, handle: Timer | None) -> bool:
+        """Check if a scheduled callback is still pending."""
+        return handle is not None and not handle.cancelled
+
+    # Time
+
+    def get_now_ts(self) -> float:
+        """Get the current virtual time as a UTC timestamp."""
+        return self.simulation.now_ts
+
+    def datetime(self) -> dt.datetime:
+        """Get the current virtual local time."""
+        return self.simulation.local(self.simulation.now_ts)
+
+    def date(self) -> dt.date:
+        """Get the current virtual local date."""
+        return self.datetime().date()
+
+    def time(self) -> dt.time:
+        """Get the current virtual local time of day."""
+        return self.datetime().time()
+
+    def get_tz_offset(self) -> float:
+        """Get the local timezone offset from UTC in minutes."""
+        return self.simulation.tz_offset
+
+    @staticmethod
+    def convert_utc(utc: str) -> dt.datetime:
+        """Convert an ISO formatted UTC time to a datetime."""
+        return dt.datetime.fromisoformat(utc)
+
+    @staticmethod
+    def parse_time(time_str: str | dt.time) -> dt.time:
+        """Parse a time of day (HH:MM or HH:MM:SS)."""
+        if isinstance(time_str, dt.time):
+            return time_str
+        return dt.time.fromisoformat(time_str)
+
+    def parse_datetime(
+        self,
+        time_str: str | dt.datetime,
+    ) -> dt.datetime:
+        """Parse a local date and time, or a time of day today."""
+        if isinstance(time_str, dt.datetime):
+            return time_str
+        try:
+            return dt.datetime.combine(self.date(), self.parse_time(time_str))
+        except ValueError:
+            return dt.datetime.fromisoformat(time_str)
+
+    def now_is_between(self, start: str, end: str) -> bool:
+        """Check if the current time of day is between two times (may wrap)."""
+        start, end, now = self.parse_time(start), self.parse_time(end), self.time()
+        if start <= end:
+            return start <= now <= end
+        return now >= start or now <= end
+
+    def sunset(self) -> dt.datetime:
+        """Get today's sunset (from sun.sun if available, otherwise 18:00)."""
+        return self.__sun_time("next_setting", dt.time(18))
+
+    def sunrise(self) -> dt.datetime:
+        """Get today's sunrise (from sun.sun if available, otherwise 06:00)."""
+        return self.__sun_time("next_rising", dt.time(6))
+
+    def __sun_time(
+        self,
+        attribute: str,
+        default: dt.time,
+    ) -> dt.datetime:
+        """Get a sun event time from sun.sun on today's date."""
+        value = self.get_state("sun.sun", attribute=attribute)
+        if value is None:
+            return dt.datetime.combine(self.date(), default)
+        sun_time = self.simulation.local(self.convert_utc(value).timestamp()).time()
+        return dt.datetime.combine(self.date(), sun_time)
+
+
+class Simulation:
+    """Virtual clock, entity store and service call recorder for the apps."""
+
+    def __init__(
+        self,
+        states: Iterable[dict],
+        start: float,
+        tz_offset: float = 0,
+    ):
+        """Load initial entity states and start the clock."""
+        self.now_ts = start
+        self.tz_offset = tz_offset
+        self.states: dict[str, dict] = {}
+        self.changes: dict[str, list[tuple[float, str, dict]]] = {}
+        self.apps: dict[str, SimulatedHass] = {}
+        self.state_listeners: dict[int, StateListener] = {}
+        self.event_listeners: dict[int, tuple] = {}
+        self.log_listeners: dict[int, tuple] = {}
+        self.timers: list[Timer] = []
+        self.queue: deque[tuple] = deque()
+        self.service_calls: list[ServiceCall] = []
+        self.callback_count = 0
+        self.errors = 0
+        self.failed_apps: list[str] = []
+        self.handles = itertools.count(1)
+        self.loop = asyncio.new_event_loop()
+        self.logger = logging.getLogger("simulation")
+        for state in states:
+            self.states[state["entity_id"]] = self.__stored(
+                state["entity_id"],
+                state.get("state"),
+                state.get("attributes", {}),
+            )
+
+    @staticmethod
+    def install():
+        """Make the apps import SimulatedHass in place of AppDaemon's Hass."""
+        modules = {}
+        for name in (
+            "appdaemon",
+            "appdaemon.plugins",
+            "appdaemon.plugins.hass",
+            "appdaemon.plugins.hass.hassapi",
+        ):
+            modules[name] = sys.modules[name] = types.ModuleType(name)
+        modules["appdaemon.plugins.hass.hassapi"].Hass = SimulatedHass
+        modules["appdaemon.plugins.hass"].hassapi = modules[
+            "appdaemon.plugins.hass.hassapi"
+        ]
+
+    def load_apps(self, configs: dict[str, dict]):
+        """Create then initialise apps (by priority) from their app configs."""
+        for name, args in sorted(
+            configs.items(),
+            key=lambda item: item[1].get("priority", 50),
+        ):
+            module = __import__(args["module"])
+            app_class = getattr(module, args["class"])
+            self.apps[name] = app_class(self, name, args)
+        for name, app in self.apps.items():
+            if not self.run(app, app.initialize, (), {}):
+                self.failed_apps.append(name)
+        self.drain()
+        self.fire_event("appd_started")
+        self.drain()
+
+    def terminate(self):
+        """Terminate all apps."""
+        for app in reversed(self.apps.values()):
+            self.run(app, app.terminate, (), {})
+        self.loop.close()
+
+    def next_handle(self) -> int:
+        """Get a unique handle for a listener or timer."""
+        return next(self.handles)
+
+    # Time
+
+    def local(self, timestamp: float) -> dt.datetime:
+        """Convert a UTC timestamp to a naive local datetime."""
+        return dt.datetime.fromtimestamp(
+            timestamp,
+            dt.UTC,
+        ).replace(tzinfo=None) + dt.timedelta(minutes=self.tz_offset)
+
+    def to_ts(self, local: dt.datetime) -> float:
+        """Convert a naive local datetime to a UTC timestamp."""
+        return (
+            (local - dt.timedelta(minutes=self.tz_offset))
+            .replace(tzinfo=dt.UTC)
+            .timestamp()
+        )
+
+    def schedule(
+        self,
+        app: SimulatedHass,
+        callback: Callable,
+        when: float,
+        kwargs: dict,
+        interval: float = 0,
+    ) -> Timer:
+        """Add a callback to the virtual scheduler."""
+        timer = Timer(when, self.next_handle(), app, callback, kwargs, interval)
+        heapq.heappush(self.timers, timer)
+        return timer
+
+    def run_until(self, timestamp: float):
+        """Advance the clock, firing every timer that falls due on the way."""
+        while self.timers and self.timers[0].when <= timestamp:
+            timer = heapq.heappop(self.timers)
+            if timer.cancelled:
+                continue
+            self.now_ts = max(self.now_ts, timer.when)
+            if timer.interval:
+                timer.when += timer.interval
+                heapq.heappush(self.timers, timer)
+            else:
+                timer.cancelled = True
+            kwargs = dict(timer.kwargs)
+            constraint = kwargs.pop("constrain_input_boolean", None)
+            self.enqueue(timer.app, timer.callback, (), kwargs, constraint)
+            self.drain()
+        self.now_ts = max(self.now_ts, timestamp)
+
+    def advance(self, seconds: float):
+        """Advance the clock by a number of seconds."""
+        self.run_until(self.now_ts + seconds)
+
+    # Callbacks
+
+    def enqueue(
+        self,
+        app: SimulatedHass,
+        callback: Callable,
+        args: tuple,
+        kwargs: dict,
+        constraint: str | None = None,
+    ):
+        """Queue a callback to run once the current one has finished."""
+        self.queue.append((app, callback, args, kwargs, constraint))
+
+    def drain(self):
+        """Run queued callbacks (and any they queue) until none remain."""
+        while self.queue:
+            app, callback, args, kwargs, constraint = self.queue.popleft()
+            if constraint and self.value(constraint, None) != "on":
+                continue
+            self.run(app, callback, args, kwargs)
+
+    def run(
+        self,
+        app: SimulatedHass,
+        callback: Callable,
+        args: tuple,
+        kwargs: dict,
+    ) -> bool:
+        """Run a callback, logging rather than raising any exception.
+
+        Returns whether the callback completed without raising.
+        """
+        self.callback_count += 1
+        try:
+            result = callback(*args, **kwargs)
+            if asyncio.iscoroutine(result):
+                self.loop.run_until_complete(result)
+        except Exception:
+            self.errors += 1
+            self.logger.exception("Error in '%s' callback %s", app.name, callback)
+            self.emit_log(app.name, "ERROR", "error_log", "Traceback (simulated)")
+            return False
+        return True
+
+    def emit_log(self, app_name: str, level: str, log_type: str, message: str):
+        """Pass a log message on to log listeners."""
+        for app, callback in list(self.log_listeners.values()):
+            self.enqueue(
+                app,
+                callback,
+                (app_name, self.local(self.now_ts), level, log_type, message),
+                {},
+            )
+
+    def fire_event(self, event: str, **data: dict):
+        """Pass an event to matching event listeners."""
+        for app, callback, listened_event, filters in list(
+            self.event_listeners.values(),
+        ):
+            if listened_event == event and all(
+                data.get(key) == value for key, value in filters.items()
+            ):
+                self.enqueue(app, callback, (event, data), dict(filters))
+
+    # Entity store
+
+    def __stored(self, entity_id: str, state: str | None, attributes: dict) -> dict:
+        """Build a stored state with change time and system context."""
+        changed = self.local(self.now_ts) - dt.timedelta(
+            minutes=self.tz_offset,
+        )
+        return {
+            "entity_id": entity_id,
+            "state": state,
+            "attributes": dict(attributes),
+            "last_changed": changed.replace(tzinfo=dt.UTC).isoformat(),
+            "last_updated": changed.replace(tzinfo=dt.UTC).isoformat(),
+            "context": {"id": None, "parent_id": None, "user_id": None},
+            "_changed_ts": self.now_ts,
+        }
+
+    def public_state(self, entity_id: str) -> dict:
+        """Get a copy of an entity's state as AppDaemon would present it."""
+        state = dict(self.states[entity_id])
+        del state["_changed_ts"]
+        return StateView(state)
+
+    def value(self, entity_id: str, attribute: str | None) -> Any:
+        """Get an entity's state, a top level field, or one of its attributes."""
+        state = self.states.get(entity_id)
+        if state is None:
+            return None
+        if attribute is None or attribute == "state":
+            return state["state"]
+        if attribute == "all":
+            return self.public_state(entity_id)
+        if attribute in state["attributes"] or attribute not in state:
+            return state["attributes"].get(attribute)
+        return state[attribute]
+
+    def set_state(
+        self,
+        entity_id: str,
+        state: str | None = None,
+        attributes: dict | None = None,
+        user_id: str | None = None,
+    ):
+        """Change an entity's state/attributes and notify state listeners."""
+        old = self.states.get(entity_id)
+        if old is None:
+            old = self.__stored(entity_id, None, {})
+        new = dict(old)
+        new["attributes"] = {**old["attributes"], **(attributes or {})}
+        if state is not None:
+            new["state"] = str(state)
+        if new["state"] == old["state"] and new["attributes"] == old["attributes"]:
+            self.states[entity_id] = new
+            return
+        stamp = self.__stored(entity_id, None, {})
+        new["last_updated"] = stamp["last_updated"]
+        new["context"] = {"id": None, "parent_id": None, "user_id": user_id}
+        if new["state"] != old["state"]:
+            new["last_changed"] = stamp["last_changed"]
+            new["_changed_ts"] = self.now_ts
+        self.states[entity_id] = new
+        self.changes.setdefault(entity_id, []).append(
+            (self.now_ts, new["state"], new["attributes"]),
+        )
+        for listener in list(self.state_listeners.values()):
+            self.__notify(listener, entity_id, old, new)
+
+    def history(
+        self,
+        entity_id: str,
+        start_time: dt.datetime | None = None,
+        end_time: dt.datetime | None = None,
+        days: float | None = None,
+    ) -> list[dict]:
+        """Get the state changes of an entity recorded during the simulation."""
+        end = self.to_ts(end_time) if end_time else self.now_ts
+        start = (
+            self.to_ts(start_time)
+            if start_time
+            else end - 86400 * (days if days is not None else 1)
+        )
+        return [
+            {
+                "entity_id": entity_id,
+                "state": state,
+                "attributes": attributes,
+                "last_changed": dt.datetime.fromtimestamp(
+                    timestamp,
+                    dt.UTC,
+                ).isoformat(),
+            }
+            for timestamp, state, attributes in self.changes.get(entity_id, [])
+            if start <= timestamp <= end
+        ]
+
+    def __notify(self, listener: StateListener, entity_id: str, old: dict, new: dict):
+        """Queue a state callback if the change matches the listener's filters."""
+        entity = listener.entity
+        if entity is not None and entity not in (entity_id, entity_id.split(".", 1)[0]):
+            return
+        attribute = listener.options.get("attribute")
+        old_value = self.__listened_value(old, attribute)
+        new_value = self.__listened_value(new, attribute)
+        if attribute != "all" and old_value == new_value:
+            return
+        if not self.__matches(listener.options, old_value, new_value):
+            if listener.duration_timer is not None:
+                listener.duration_timer.cancelled = True
+                listener.duration_timer = None
+            return
+        args = (entity_id, attribute or "state", old_value, new_value)
+        duration = listener.options.get("duration")
+        if duration:
+            if listener.duration_timer is not None:
+                listener.duration_timer.cancelled = True
+            listener.duration_timer = self.schedule(
+                listener.app,
+                lambda **_: self.__dispatch(listener, args),
+                self.now_ts + float(duration),
+                {},
+            )
+        else:
+            self.__dispatch(listener, args)
+
+    def __dispatch(self, listener: StateListener, args: tuple):
+        """Queue a state callback (if the listener still exists)."""
+        listener.duration_timer = None
+        if listener.handle not in self.state_listeners:
+            return
+        if listener.options.get("oneshot"):
+            del self.state_listeners[listener.handle]
+        self.enqueue(
+            listener.app,
+            listener.callback,
+            args,
+            dict(listener.kwargs),
+            listener.options.get("constrain_input_boolean"),
+        )
+
+    def trigger_immediate(self, listener: StateListener):
+        """Queue a state callback for the current state (immediate=True)."""
+        if listener.entity not in self.states:
+            return
+        attribute = listener.options.get("attribute")
+        value = self.__listened_value(self.states[listener.entity], attribute)
+        if self.__matches(listener.options, None, value, check_old=False):
+            self.__dispatch(
+                listener,
+                (listener.entity, attribute or "state", None, value),
+            )
+
+    @staticmethod
+    def __listened_value(state: dict, attribute: str | None) -> Any:
+        """Get the value of the listened attribute from a stored state."""
+        if attribute is None:
+            return state["state"]
+        if attribute == "all":
+            return {key: value for key, value in state.items() if key != "_changed_ts"}
+        if attribute in state["attributes"] or attribute not in state:
+            return state["attributes"].get(attribute)
+        return state[attribute]
+
+    @staticmethod
+    def __matches(
+        options: dict,
+        old: Any,
+        new: Any,
+        *,
+        check_old: bool = True,
+    ) -> bool:
+        """Check old/new values against a listener's (value or callable) filters."""
+        for key, value in (("new", new), ("old", old)):
+            if key not in options or (key == "old" and not check_old):
+                continue
+            expected = options[key]
+            if callable(expected):
+                try:
+                    if not expected(value):
+                        return False
+                except (TypeError, KeyError):
+                    return False
+            elif expected != value:
+                return False
+        return True
+
+    # Services
+
+    def call_service(self, app_name: str, service: str, data: dict) -> dict | None:
+        """Record a service call, apply its effect and return any response."""
+        self.service_calls.append(ServiceCall(self.now_ts, app_name, service, data))
+        domain, action = service.split("/", 1)
+        entity_ids = data.get("entity_id") or []
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        if service == "weather/get_forecasts":
+            return {entity_id: self.forecast(entity_id) for entity_id in entity_ids}
+        for entity_id in entity_ids:
+            self.__apply_service(entity_id, domain, action, data)
+        return None
+
+    def forecast(self, entity_id: str, hours: int = 48) -> dict:
+        """Get a weather entity's forecast attribute, or assume current conditions.
+
+        Recorded history rarely includes forecasts, so without one the current
+        (apparent) temperature is forecast to persist hour by hour.
+        """
+        attributes = self.states.get(entity_id, {}).get("attributes", {})
+        if isinstance(attributes.get("forecast"), list):
+            return {"forecast": attributes["forecast"]}
+        hour = self.now_ts - self.now_ts % 3600
+        conditions = {
+            key: attributes[key]
+            for key in ("temperature", "apparent_temperature")
+            if attributes.get(key) is not None
+        }
+        return {
+            "forecast": [
+                {
+                    "datetime": dt.datetime.fromtimestamp(
+                        hour + 3600 * index,
+                        dt.UTC,
+                    ).isoformat(),
+                    **conditions,
+                }
+                for index in range(hours)
+            ]
+            if conditions
+            else [],
+        }
+
+    def __apply_service(self, entity_id: str, domain: str, action: str, data: dict):
+        """Approximate the effect of a service call on one entity."""
+        state = self.states.get(entity_id, {}).get("state")
+        attributes = {}
+        if action in ("turn_on", "turn_off", "toggle"):
+            on = action == "turn_on" or (action == "toggle" and state == "off")
+            new_state = "on" if on else "off"
+            if entity_id.startswith("light."):
+                attributes = {
+                    "brightness": data.get("brightness", 255) if on else None,
+                    "color_temp_kelvin": data.get("kelvin") if on else None,
+                }
+            elif entity_id.startswith("fan."):
+                attributes = {"percentage": data.get("percentage", 100) if on else 0}
+            elif entity_id.startswith("climate.") and not on:
+                new_state = "off"
+            members = self.states.get(entity_id, {}).get("attributes", {})
+            for member in members.get("entity_id", []):
+                self.__apply_service(member, domain, action, data)
+            self.set_state(entity_id, new_state, attributes)
+            return
+        effects = {
+            "set_hvac_mode": lambda: (data["hvac_mode"], {}),
+            "set_temperature": lambda: (None, {"temperature": data["temperature"]}),
+            "set_fan_mode": lambda: (None, {"fan_mode": data["fan_mode"]}),
+            "set_swing_mode": lambda: (None, {"swing_mode": data["swing_mode"]}),
+            "set_percentage": lambda: (
+                "on" if data["percentage"] > 0 else "off",
+                {"percentage": data["percentage"]},
+            ),
+            "set_direction": lambda: (None, {"direction": data["direction"]}),
+            "set_humidity": lambda: (None, {"humidity": data["humidity"]}),
+            "set_mode": lambda: (None, {"mode": data["mode"]}),
+            "set_value": lambda: (data["value"], {}),
+            "select_option": lambda: (data["option"], {}),
+            "set_datetime": lambda: (data.get("time"), {}),
+            "lock": lambda: ("locked", {}),
+            "unlock": lambda: ("unlocked", {}),
+            "reset": lambda: (0, {}),
+            "increment": lambda: (int(float(state or 0)) + 1, {}),
+        }
+        if action in effects and (domain != "input_number" or action == "set_value"):
+            new_state, attributes = effects[action]()
+            self.set_state(entity_id, new_state, attributes)
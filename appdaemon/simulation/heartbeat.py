@@ -0,0 +1,121 @@
+"""Check Control's heartbeat against a local HTTP server.
+
+Run from the appdaemon directory:
+
+    python -m simulation.heartbeat
+
+The heartbeat is pointed at a healthy, a stalled and a failing endpoint of a
+server on localhost (and at a closed port), checking that each failure (by
+timeout, HTTP error or refused connection) is counted, that Control goes
+offline after the allowed failures and that Home Assistant is restarted once a
+heartbeat is received again. Exits non-zero if any step differs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+import yaml
+from aiohttp import web
+
+from .hass import Simulation
+from .replay import load_app_configs, load_states, read_events
+
+APPS_DIR = Path(__file__).parent.parent / "apps"
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+APPS = ["Control", "Presence", "Lights", "Climate", "Media"]  # as in the fixture
+
+TIMEOUT = 0.2  # seconds before a heartbeat is abandoned
+MAX_FAIL_COUNT = 3  # failed heartbeats before going offline
+
+# (endpoint, online, failures counted, restarts) expected after each heartbeat
+STEPS = [
+    ("/ok", True, 0, 0),
+    ("/stall", True, 1, 0),
+    ("/error", True, 2, 0),
+    (None, False, 3, 0),
+    ("/ok", True, 0, 1),
+]
+
+
+async def start_server() -> tuple[web.AppRunner, str]:
+    """Serve healthy, stalled and failing endpoints on a free localhost port."""
+
+    async def healthy(request: web.Request) -> web.Response:
+        del request
+        return web.Response(text="ok")
+
+    async def stalled(request: web.Request) -> web.Response:
+        del request
+        await asyncio.sleep(TIMEOUT * 5)
+        return web.Response(text="late")
+
+    async def failing(request: web.Request) -> web.Response:
+        del request
+        return web.Response(status=500)
+
+    app = web.Application()
+    app.router.add_get("/ok", healthy)
+    app.router.add_get("/stall", stalled)
+    app.router.add_get("/error", failing)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+def main() -> int:
+    """Send a heartbeat for each step, report the results and compare them."""
+    logging.basicConfig(level="WARNING", format="%(name)s %(message)s")
+    sys.path.insert(0, str(APPS_DIR))
+    Simulation.install()
+    with (FIXTURES_DIR / "secrets.yaml").open(encoding="utf-8") as file:
+        secrets = yaml.safe_load(file)
+    configs = load_app_configs(APPS_DIR, APPS, secrets)
+    configs["Control"]["heartbeat_timeout"] = TIMEOUT
+    configs["Control"]["heartbeat_max_fail_count"] = MAX_FAIL_COUNT
+    events = read_events([FIXTURES_DIR / "history.csv"])
+    simulation = Simulation(load_states(FIXTURES_DIR / "states.json"), events[0][0])
+    simulation.load_apps(configs)
+    control = simulation.apps["Control"]
+    runner, url = simulation.loop.run_until_complete(start_server())
+
+    failed = simulation.errors > 0
+    for endpoint, online, fail_count, restarts in STEPS:
+        # Nothing listens on port 1, so the connection is refused
+        control.constants["heartbeat_url"] = (
+            "http://127.0.0.1:1/" if endpoint is None else url + endpoint
+        )
+        completed = simulation.run(control, control.heartbeat, (), {})
+        result = {
+            "endpoint": endpoint,
+            "online": control.online,
+            "fail_count": control.timers["heartbeat_fail_count"],
+            "restarts": sum(
+                call.service == "homeassistant/restart"
+                for call in simulation.service_calls
+            ),
+        }
+        sys.stdout.write(json.dumps(result) + "\n")
+        expected = {
+            "endpoint": endpoint,
+            "online": online,
+            "fail_count": fail_count,
+            "restarts": restarts,
+        }
+        if not completed or result != expected:
+            sys.stderr.write(f"expected {expected}, got {result}\n")
+            failed = True
+
+    simulation.loop.run_until_complete(runner.cleanup())
+    simulation.terminate()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""Replay recorded Home Assistant history through the apps on a virtual clock."""
+
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import json
+import time
+from typing import TYPE_CHECKING, Any
+
+import yaml
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from pathlib import Path
+
+    from .hass import Simulation
+
+INFLUX_UNESCAPE = str.maketrans({"\x00": ",", "\x01": " ", "\x02": "="})
+
+
+def parse_time(value: str) -> float:
+    """Parse an ISO formatted (UTC unless stated) time or epoch to a timestamp."""
+    try:
+        return float(value)
+    except ValueError:
+        parsed = dt.datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=dt.UTC)
+        return parsed.timestamp()
+
+
+def read_csv(path: Path) -> Iterator[tuple[float, str, str, dict]]:
+    """Read a history export with entity_id, state and last_changed columns.
+
+    Any further columns are treated as attributes (empty cells are skipped).
+    """
+    with path.open(newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            entity_id = row.pop("entity_id")
+            state = row.pop("state")
+            timestamp = parse_time(row.pop("last_changed"))
+            attributes = {key: value for key, value in row.items() if value}
+            yield timestamp, entity_id, state, attributes
+
+
+def _split_unescaped(text: str, separator: str) -> list[str]:
+    """Split influx line protocol on separators not escaped or quoted."""
+    parts, current, quoted, escaped = [], [], False, False
+    for char in text:
+        if escaped:
+            current.append({",": "\x00", " ": "\x01", "=": "\x02"}.get(char, char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+            current.append(char)
+        elif char == separator and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _influx_value(value: str) -> Any:
+    """Convert an influx field value to a Python value."""
+    if value.startswith('"'):
+        return value[1:-1].translate(INFLUX_UNESCAPE)
+    if value[-1] in "iu" and value[:-1].lstrip("-").isdigit():
+        return int(value[:-1])
+    if value in ("t", "T", "true", "True", "TRUE"):
+        return True
+    if value in ("f", "F", "false", "False", "FALSE"):
+        return False
+    return float(value)
+
+
+def read_influx(path: Path) -> Iterator[tuple[float, str, str, dict]]:
+    """Read an InfluxDB line protocol export of Home Assistant's influxdb output.
+
+    Entities are identified by the domain and entity_id tags, with the state
+    taken from the state field (or value field for numeric states) and other
+    fields becoming attributes. Timestamps are in nanoseconds.
+    """
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()  # noqa: PLW2901
+            if not line or line.startswith("#"):
+                continue
+            key, fields, *stamp = _split_unescaped(line, " ")
+            tags = dict(
+                tag.translate(INFLUX_UNESCAPE).split("=", 1)
+                for tag in _split_unescaped(key, ",")[1:]
+            )
+            if "domain" not in tags or "entity_id" not in tags:
+                continue
+            values = {}
+            for field in _split_unescaped(fields, ","):
+                name, value = field.split("=", 1)
+                name = name.translate(INFLUX_UNESCAPE).removesuffix("_str")
+                values[name] = _influx_value(value)
+            state = values.pop("state", values.pop("value", None))
+            values.pop("value", None)
+            if state is None:
+                continue
+            if isinstance(state, float) and state.is_integer():
+                state = int(state)
+            timestamp = int(stamp[0]) / 1e9 if stamp else time.time()
+            yield timestamp, f"{tags['domain']}.{tags['entity_id']}", str(state), values
+
+
+def read_events(paths: Iterable[Path]) -> list[tuple[float, str, str, dict]]:
+    """Read and merge recorded state changes from CSV or influx exports."""
+    events = []
+    for path in paths:
+        reader = read_csv if path.suffix.lower() == ".csv" else read_influx
+        events.extend(reader(path))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def load_app_configs(
+    apps_dir: Path,
+    names: Iterable[str] | None = None,
+    secrets: dict | None = None,
+) -> dict[str, dict]:
+    """Load app configs from the apps directory's yaml files.
+
+    Secrets are resolved from the given mapping (None when missing). When names
+    are given only those apps and their dependencies are loaded.
+    """
+    secrets = secrets or {}
+
+    class Loader(yaml.SafeLoader):
+        """Yaml loader resolving !secret tags."""
+
+    Loader.add_constructor(
+        "!secret",
+        lambda loader, node: secrets.get(loader.construct_scalar(node)),
+    )
+    configs = {}
+    for path in sorted(apps_dir.glob("*.yaml")):
+        with path.open(encoding="utf-8") as file:
+            configs.update(yaml.load(file, Loader=Loader) or {})  # noqa: S506
+    if names is None:
+        return configs
+    selected, pending = {}, list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected[name] = configs[name]
+            dependencies = configs[name].get("dependencies", [])
+            pending.extend(
+                [dependencies] if isinstance(dependencies, str) else dependencies,
+            )
+    return selected
+
+
+class Replay:
+    """Drive a simulation from recorded state changes and report on the run."""
+
+    def __init__(
+        self,
+        simulation: Simulation,
+        events: list[tuple[float, str, str, dict]],
+    ):
+        """Prepare to replay the given (timestamp, entity, state, attributes)."""
+        self.simulation = simulation
+        self.events = events
+        self.wall_time = 0.0
+        self.simulated_time = 0.0
+
+    def run(self, settle: float = 0):
+        """Replay every event then let timers run for a further settle period."""
+        simulation = self.simulation
+        start_ts = simulation.now_ts
+        start = time.perf_counter()
+        for timestamp, entity_id, state, attributes in self.events:
+            simulation.run_until(timestamp)
+            simulation.set_state(entity_id, state, attributes)
+            simulation.drain()
+        simulation.advance(settle)
+        self.wall_time = time.perf_counter() - start
+        self.simulated_time = simulation.now_ts - start_ts
+
+    def report(self, tracked: Iterable[str] = ()) -> dict:
+        """Summarise throughput of the last run and the final tracked states."""
+        simulation = self.simulation
+        wall_time = self.wall_time or 1e-9
+        report = {
+            "events": len(self.events),
+            "callbacks": simulation.callback_count,
+            "service_calls": len(simulation.service_calls),
+            "errors": simulation.errors,
+            "failed_apps": simulation.failed_apps,
+            "simulated_seconds": round(self.simulated_time, 1),
+            "wall_seconds": round(self.wall_time, 3),
+            "speedup": round(self.simulated_time / wall_time, 1),
+            "events_per_second": round(len(self.events) / wall_time, 1),
+            "callbacks_per_second": round(simulation.callback_count / wall_time, 1),
+        }
+        for entity_id in tracked:
+            state = simulation.states.get(entity_id, {})
+            report[entity_id] = {
+                "state": state.get("state"),
+                **state.get("attributes", {}),
+            }
+        return report
+
+    def write_calls(self, path: Path):
+        """Write the recorded service calls as JSON lines."""
+        with path.open("w", encoding="utf-8") as file:
+            for call in self.simulation.service_calls:
+                file.write(json.dumps(call.as_dict(), default=str) + "\n")
+
+    def compare_calls(self, path: Path) -> list[str]:
+        """Compare the recorded service calls with those from an earlier run."""
+        with path.open(encoding="utf-8") as file:
+            expected = [json.loads(line) for line in file if line.strip()]
+        actual = [
+            json.loads(json.dumps(call.as_dict(), default=str))
+            for call in self.simulation.service_calls
+        ]
+        differences = [
+            f"call {index}: expected {old}, got {new}"
+            for index, (old, new) in enumerate(zip(expected, actual, strict=False))
+            if old != new
+        ]
+        if len(expected) != len(actual):
+            differences.append(
+                f"expected {len(expected)} service calls, got {len(actual)}",
+            )
+        return differences
+
+
+def load_states(path: Path | None) -> list[dict]:
+    """Load initial states from a dump of Home Assistant's /api/states."""
+    if path is None:
+        return []
+    with path.open(encoding="utf-8") as file:
+        return json.load(file)
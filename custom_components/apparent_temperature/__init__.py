@@ -0,0 +1 @@
+"""The Apparent Temperature integration."""
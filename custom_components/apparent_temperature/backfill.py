@@ -0,0 +1,468 @@
+r"""Backfill hourly apparent temperature statistics from recorded history.
+
+The apparent temperature sensors only have history from when they were added,
+but their temperature, humidity and wind sources usually go back much further.
+This calculates apparent temperature over that history with the sensors' own
+formula and writes hourly mean, min and max as long-term statistics, which is
+what the history graphs and energy/statistics cards use beyond the recorder's
+purge window.
+
+It runs outside Home Assistant (numpy and pyyaml only), against a copy of the
+recorder's SQLite database or InfluxDB line protocol exports, for example:
+
+    python custom_components/apparent_temperature/backfill.py \
+        --recorder home-assistant_v2.db
+
+    python custom_components/apparent_temperature/backfill.py \
+        --influx export.lp --database home-assistant_v2.db --csv statistics.csv
+
+Copy the database back while Home Assistant is stopped. Hours that already have
+statistics are left untouched.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import datetime as dt
+import json
+import re
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+import numpy as np
+import yaml
+from formula import apparent_temperature
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+CONFIG = (
+    Path(__file__).parents[2]
+    / "configuration"
+    / "climate"
+    / "apparent_temperature.yaml"
+)
+HOUR = 3600
+UNAVAILABLE = {"unknown", "unavailable", "None", ""}
+
+# Linear conversions (scale, offset) to °C and m/s, which also identify the role
+# of a source as the sensor does from its unit.
+TEMPERATURE_UNITS = {
+    "°C": (1.0, 0.0),
+    "°F": (5 / 9, -160 / 9),
+    "K": (1.0, -273.15),
+}
+SPEED_UNITS = {
+    "m/s": (1.0, 0.0),
+    "km/h": (1 / 3.6, 0.0),
+    "mph": (0.44704, 0.0),
+    "kn": (1852 / 3600, 0.0),
+    "ft/s": (0.3048, 0.0),
+}
+
+
+class Room(NamedTuple):
+    """An apparent temperature sensor and its source entities."""
+
+    statistic_id: str
+    name: str
+    sources: tuple[str, ...]
+
+
+class Statistics(NamedTuple):
+    """Hourly statistics for one sensor."""
+
+    start: np.ndarray
+    mean: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+
+
+def load_rooms(path: Path) -> list[Room]:
+    """Load apparent_temperature sensors from a configuration package."""
+
+    class Loader(yaml.SafeLoader):
+        """Yaml loader ignoring Home Assistant tags (!secret, !include, ...)."""
+
+    Loader.add_multi_constructor("!", lambda _loader, _suffix, _node: None)
+    with path.open(encoding="utf-8") as file:
+        config = yaml.load(file, Loader=Loader) or {}  # noqa: S506
+
+    rooms = []
+    for platform in config.get("sensor", []):
+        if platform.get("platform") != "apparent_temperature":
+            continue
+        for sensor in platform.get("sensors", [platform]):
+            sources = sensor["source"]
+            sources = [sources] if isinstance(sources, str) else sources
+            name = sensor.get("name") or sources[0].split(".", 1)[1]
+            slug = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+            rooms.append(Room(f"sensor.{slug}", name, tuple(sources)))
+    return rooms
+
+
+def _to_floats(states: Iterable[str | None]) -> np.ndarray:
+    """Convert recorded states to floats, with NaN for missing, unavailable or text."""
+
+    def to_float(state: str | None) -> float:
+        if state is None or state in UNAVAILABLE:
+            return np.nan
+        try:
+            return float(state)
+        except ValueError:
+            return np.nan
+
+    return np.fromiter(map(to_float, states), dtype=float)
+
+
+def _groups(
+    entity_ids: list[str],
+    units: list[str | None],
+    times: list[float],
+    states: list[str | None],
+) -> Iterator[tuple[str, str | None, np.ndarray, np.ndarray]]:
+    """Split a chunk of rows into (entity_id, unit, times, values) groups."""
+    rows = defaultdict(list)
+    for index, key in enumerate(zip(entity_ids, units, strict=True)):
+        rows[key].append(index)
+    all_times = np.asarray(times, dtype=float)
+    all_values = _to_floats(states)
+    for (entity_id, unit), indices in rows.items():
+        index = np.asarray(indices)
+        yield entity_id, unit, all_times[index], all_values[index]
+
+
+def read_recorder(
+    path: Path,
+    entity_ids: list[str],
+    chunk_size: int,
+) -> Iterator[tuple[str, str | None, np.ndarray, np.ndarray]]:
+    """Stream states of the given entities from a recorder SQLite database."""
+    with contextlib.closing(
+        sqlite3.connect(f"file:{path}?mode=ro", uri=True),
+    ) as connection:
+        placeholders = ",".join("?" * len(entity_ids))
+        names = dict(
+            connection.execute(
+                "SELECT metadata_id, entity_id FROM states_meta"  # noqa: S608
+                f" WHERE entity_id IN ({placeholders})",
+                entity_ids,
+            ),
+        )
+        metadata_ids = ",".join(str(metadata_id) for metadata_id in names)
+        if not metadata_ids:
+            return
+        units = {
+            attributes_id: json.loads(shared_attrs).get("unit_of_measurement")
+            for attributes_id, shared_attrs in connection.execute(
+                "SELECT attributes_id, shared_attrs FROM state_attributes"  # noqa: S608
+                " WHERE attributes_id IN (SELECT DISTINCT attributes_id FROM states"
+                f" WHERE metadata_id IN ({metadata_ids}))",
+            )
+        }
+        cursor = connection.execute(
+            "SELECT metadata_id, attributes_id, last_updated_ts, state"  # noqa: S608
+            f" FROM states WHERE metadata_id IN ({metadata_ids})",
+        )
+        while rows := cursor.fetchmany(chunk_size):
+            metadata, attributes, times, states = zip(*rows, strict=True)
+            yield from _groups(
+                [names[metadata_id] for metadata_id in metadata],
+                [units.get(attributes_id) for attributes_id in attributes],
+                list(times),
+                list(states),
+            )
+
+
+def read_influx(
+    path: Path,
+    entity_ids: list[str],
+    chunk_size: int,
+) -> Iterator[tuple[str, str | None, np.ndarray, np.ndarray]]:
+    """Stream values of the given entities from an InfluxDB line protocol export.
+
+    Expects Home Assistant's influxdb integration layout: the measurement is the
+    unit, domain and entity_id are tags and the value field holds the state, with
+    nanosecond timestamps.
+    """
+    wanted = set(entity_ids)
+    key_pattern = re.compile(r"((?:[^ \\]|\\.)*) ")
+    value_pattern = re.compile(r"(?:^|,)value=([^,]+)")
+
+    chunk: tuple[list, list, list, list] = ([], [], [], [])
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            key = key_pattern.match(line)
+            if key is None:
+                continue
+            measurement, *pairs = key.group(1).split(",")
+            tags = dict(pair.split("=", 1) for pair in pairs if "=" in pair)
+            entity_id = f"{tags.get('domain')}.{tags.get('entity_id')}"
+            if entity_id not in wanted:
+                continue
+            fields, _, stamp = line[key.end() :].rstrip().rpartition(" ")
+            value = value_pattern.search(fields)
+            if value is None:
+                continue
+            chunk[0].append(entity_id)
+            chunk[1].append(measurement.replace("\\", ""))
+            chunk[2].append(int(stamp) / 1e9)
+            chunk[3].append(value.group(1))
+            if len(chunk[0]) >= chunk_size:
+                yield from _groups(*chunk)
+                chunk = ([], [], [], [])
+    if chunk[0]:
+        yield from _groups(*chunk)
+
+
+def collect(
+    groups: Iterable[tuple[str, str | None, np.ndarray, np.ndarray]],
+) -> dict[str, tuple[str, np.ndarray, np.ndarray]]:
+    """Convert units and join chunks into (role, times, values) per entity."""
+    chunks = defaultdict(list)
+    for entity_id, unit, times, values in groups:
+        if unit in TEMPERATURE_UNITS:
+            role, (scale, offset) = "temperature", TEMPERATURE_UNITS[unit]
+        elif unit in SPEED_UNITS:
+            role, (scale, offset) = "wind", SPEED_UNITS[unit]
+        elif unit == "%":
+            role, scale, offset = "humidity", 1.0, 0.0
+        else:
+            role = next(
+                (
+                    name
+                    for name in ("temperature", "humidity", "wind")
+                    if name in entity_id
+                ),
+                None,
+            )
+            if role is None:
+                continue
+            scale, offset = 1.0, 0.0
+        chunks[entity_id].append((role, times, values * scale + offset))
+
+    series = {}
+    for entity_id, parts in chunks.items():
+        times = np.concatenate([part[1] for part in parts])
+        values = np.concatenate([part[2] for part in parts])
+        order = np.argsort(times, kind="stable")
+        series[entity_id] = (parts[-1][0], times[order], values[order])
+    return series
+
+
+def _as_of(times: np.ndarray, values: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """Return the last value recorded at or before each time (NaN before any)."""
+    index = np.searchsorted(times, at, side="right") - 1
+    return np.where(index >= 0, values[np.maximum(index, 0)], np.nan)
+
+
+def calculate(
+    room: Room,
+    series: dict[str, tuple[str, np.ndarray, np.ndarray]],
+) -> tuple[np.ndarray, np.ndarray]:
+    """Calculate apparent temperature whenever any of the room's sources changed.
+
+    As in the sensor, a missing wind source counts as still air.
+    """
+    roles = {
+        role: (times, values)
+        for role, times, values in (
+            series[source] for source in room.sources if source in series
+        )
+    }
+    if "temperature" not in roles or "humidity" not in roles:
+        return np.empty(0), np.empty(0)
+    times = np.unique(np.concatenate([times for times, _ in roles.values()]))
+    temperature = _as_of(*roles["temperature"], times)
+    humidity = _as_of(*roles["humidity"], times)
+    wind = _as_of(*roles["wind"], times) if "wind" in roles else np.zeros_like(times)
+    return times, apparent_temperature(temperature, humidity, np.nan_to_num(wind))
+
+
+def hourly_statistics(times: np.ndarray, values: np.ndarray) -> Statistics:
+    """Aggregate to time weighted hourly mean, min and max, as the recorder does.
+
+    Each value holds until the next, and only hours completed before the last
+    value are included.
+    """
+    if not len(times):
+        return Statistics(*(np.empty(0),) * 4)
+    first = times[0] // HOUR * HOUR
+    last = times[-1] // HOUR * HOUR
+    bounds = np.arange(first, last + HOUR, HOUR)
+    if len(bounds) < 2:  # noqa: PLR2004
+        return Statistics(*(np.empty(0),) * 4)
+
+    points = np.union1d(times[times < last], bounds)
+    starts = points[:-1]
+    durations = np.diff(points)
+    segments = _as_of(times, values, starts)
+    hours = ((starts - first) // HOUR).astype(int)
+    count = len(bounds) - 1
+
+    valid = ~np.isnan(segments)
+    weight = np.bincount(hours[valid], durations[valid], minlength=count)
+    total = np.bincount(
+        hours[valid],
+        segments[valid] * durations[valid],
+        minlength=count,
+    )
+    first_segments = np.searchsorted(starts, bounds[:-1])
+    minimum = np.fmin.reduceat(segments, first_segments)
+    maximum = np.fmax.reduceat(segments, first_segments)
+
+    has_data = weight > 0
+    return Statistics(
+        bounds[:-1][has_data],
+        total[has_data] / weight[has_data],
+        minimum[has_data],
+        maximum[has_data],
+    )
+
+
+def write_database(path: Path, room: Room, statistics: Statistics) -> int:
+    """Insert statistics into a recorder database, returning rows added."""
+    connection = sqlite3.connect(path)
+    columns = {
+        row[1] for row in connection.execute("PRAGMA table_info(statistics_meta)")
+    }
+    with connection:
+        row = connection.execute(
+            "SELECT id FROM statistics_meta WHERE statistic_id = ?",
+            (room.statistic_id,),
+        ).fetchone()
+        if row is None:
+            metadata = {
+                "statistic_id": room.statistic_id,
+                "source": "recorder",
+                "unit_of_measurement": "°C",
+                "has_mean": True,
+                "has_sum": False,
+                "name": None,
+            }
+            if "mean_type" in columns:
+                metadata["mean_type"] = 1  # arithmetic
+            cursor = connection.execute(
+                f"INSERT INTO statistics_meta ({','.join(metadata)})"  # noqa: S608
+                f" VALUES ({','.join('?' * len(metadata))})",
+                list(metadata.values()),
+            )
+            row = (cursor.lastrowid,)
+        changes = connection.total_changes
+        now = time.time()
+        connection.executemany(
+            "INSERT OR IGNORE INTO statistics"
+            " (created_ts, metadata_id, start_ts, mean, min, max)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (now, row[0], *values)
+                for values in zip(
+                    *(array.tolist() for array in statistics),
+                    strict=True,
+                )
+            ),
+        )
+        added = connection.total_changes - changes
+    connection.close()
+    return added
+
+
+def write_csv(path: Path, results: dict[Room, Statistics]):
+    """Write statistics as CSV (statistic_id, unit, start, min, max, mean)."""
+    with path.open("w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["statistic_id", "unit", "start", "min", "max", "mean"])
+        for room, statistics in results.items():
+            for start, mean, minimum, maximum in zip(
+                *(array.tolist() for array in statistics),
+                strict=True,
+            ):
+                writer.writerow(
+                    [
+                        room.statistic_id,
+                        "°C",
+                        dt.datetime.fromtimestamp(
+                            start,
+                            dt.UTC,
+                        ).isoformat(),
+                        round(minimum, 2),
+                        round(maximum, 2),
+                        round(mean, 2),
+                    ],
+                )
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--recorder", type=Path, help="recorder SQLite database copy")
+    source.add_argument(
+        "--influx",
+        nargs="+",
+        type=Path,
+        help="InfluxDB line protocol exports",
+    )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=CONFIG,
+        help="configuration with the apparent_temperature sensors",
+    )
+    parser.add_argument(
+        "--database",
+        type=Path,
+        help="recorder database to add statistics to (default: --recorder)",
+    )
+    parser.add_argument("--csv", type=Path, help="also write statistics as CSV")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=500_000,
+        help="rows read at a time",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Calculate and write apparent temperature statistics for every room."""
+    args = parse_args()
+    database = args.database or args.recorder
+    if database is None and args.csv is None:
+        sys.stderr.write("Nowhere to write statistics: use --database or --csv\n")
+        return 1
+
+    rooms = load_rooms(args.config)
+    entity_ids = sorted({source for room in rooms for source in room.sources})
+    if args.recorder:
+        groups = read_recorder(args.recorder, entity_ids, args.chunk_size)
+    else:
+        groups = (
+            group
+            for path in args.influx
+            for group in read_influx(path, entity_ids, args.chunk_size)
+        )
+    series = collect(groups)
+
+    results = {}
+    for room in rooms:
+        times, values = calculate(room, series)
+        results[room] = statistics = hourly_statistics(times, values)
+        added = write_database(database, room, statistics) if database else 0
+        sys.stdout.write(
+            f"{room.statistic_id}: {len(times)} values, {len(statistics.start)} hours"
+            f" ({added} added)\n",
+        )
+    if args.csv:
+        write_csv(args.csv, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
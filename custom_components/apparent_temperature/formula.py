@@ -0,0 +1,23 @@
+"""Apparent temperature formula shared by the sensors."""
+
+import numpy as np
+import numpy.typing as npt
+
+
+def apparent_temperature(
+    temperature: npt.ArrayLike,
+    humidity: npt.ArrayLike,
+    wind_speed: npt.ArrayLike,
+) -> np.ndarray:
+    """Calculate apparent temperature (°C) as used by the Australian BoM.
+
+    Takes temperature in °C, relative humidity in % and wind speed in m/s as
+    scalars or equally shaped arrays (NaN propagates to the result).
+    """
+    temperature = np.asarray(temperature, dtype=float)
+    vapour_pressure = (
+        np.asarray(humidity, dtype=float)
+        * 0.06105
+        * np.exp((17.27 * temperature) / (237.7 + temperature))
+    )
+    return temperature + 0.33 * vapour_pressure - 0.7 * np.asarray(wind_speed) - 4
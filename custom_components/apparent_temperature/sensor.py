@@ -1,10 +1,11 @@
 """Sensor platform for apparent_temperature."""
 
 import logging
-import math
-from collections.abc import Mapping
+from collections.abc import Callable, Mapping
+from datetime import datetime, timedelta
 from typing import Any
 
+import numpy as np
 import voluptuous as vol
 from homeassistant.components.climate import (
     ATTR_CURRENT_HUMIDITY,
@@ -33,6 +34,7 @@ from homeassistant.const import (
     ATTR_DEVICE_CLASS,
     ATTR_UNIT_OF_MEASUREMENT,
     CONF_NAME,
+    CONF_SENSORS,
     CONF_SOURCE,
     CONF_UNIQUE_ID,
     EVENT_HOMEASSISTANT_START,
@@ -43,6 +45,7 @@ from homeassistant.const import (
     UnitOfTemperature,
 )
 from homeassistant.core import (
+    CALLBACK_TYPE,
     Event,
     HomeAssistant,
     State,
@@ -51,9 +54,16 @@ from homeassistant.core import (
 )
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_state_change_event,
+)
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType, UndefinedType
-from homeassistant.util.unit_conversion import SpeedConverter, TemperatureConverter
+from homeassistant.util.unit_conversion import (
+    BaseUnitConverter,
+    SpeedConverter,
+    TemperatureConverter,
+)
 
 from .const import (
     ATTR_HUMIDITY_SOURCE,
@@ -64,17 +74,57 @@ from .const import (
     ATTR_WIND_SPEED_SOURCE_VALUE,
     STARTUP_MESSAGE,
 )
+from .formula import apparent_temperature
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORM_SCHEMA = cv.PLATFORM_SCHEMA.extend(
+CONF_DEADBAND = "deadband"
+CONF_MIN_INTERVAL = "min_interval"
+CONF_MAX_AGE = "max_age"
+
+THROTTLE_SCHEMA = {
+    vol.Optional(CONF_DEADBAND): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Optional(CONF_MIN_INTERVAL): cv.positive_time_period,
+    vol.Optional(CONF_MAX_AGE): cv.positive_time_period,
+}
+
+SENSOR_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_SOURCE): cv.entity_ids,
         vol.Optional(CONF_NAME): cv.string,
         vol.Optional(CONF_UNIQUE_ID): cv.string,
+        **THROTTLE_SCHEMA,
     },
 )
 
+PLATFORM_SCHEMA = vol.All(
+    cv.has_at_least_one_key(CONF_SOURCE, CONF_SENSORS),
+    cv.PLATFORM_SCHEMA.extend(
+        {
+            vol.Exclusive(CONF_SOURCE, CONF_SENSORS): cv.entity_ids,
+            vol.Exclusive(CONF_SENSORS, CONF_SENSORS): vol.All(
+                cv.ensure_list,
+                [SENSOR_SCHEMA],
+            ),
+            vol.Optional(CONF_NAME): cv.string,
+            vol.Optional(CONF_UNIQUE_ID): cv.string,
+            **THROTTLE_SCHEMA,
+        },
+    ),
+)
+
+
+def _throttle_options(config: ConfigType, defaults: ConfigType) -> dict[str, Any]:
+    """Return the state write throttling options, falling back to defaults."""
+    return {
+        "deadband": config.get(CONF_DEADBAND, defaults.get(CONF_DEADBAND, 0.0)),
+        "min_interval": config.get(
+            CONF_MIN_INTERVAL,
+            defaults.get(CONF_MIN_INTERVAL, timedelta()),
+        ),
+        "max_age": config.get(CONF_MAX_AGE, defaults.get(CONF_MAX_AGE)),
+    }
+
 
 # pylint: disable=unused-argument
 async def async_setup_platform(
@@ -87,19 +137,43 @@ async def async_setup_platform(
     # Print startup message
     _LOGGER.info(STARTUP_MESSAGE)
 
+    if CONF_SENSORS in config:
+        sensors = [
+            GroupedApparentTemperatureSensor(
+                sensor.get(CONF_UNIQUE_ID),
+                sensor.get(CONF_NAME),
+                expand_entity_ids(hass, sensor[CONF_SOURCE]),
+                **_throttle_options(sensor, config),
+            )
+            for sensor in config[CONF_SENSORS]
+        ]
+        async_add_entities(sensors)
+        group = ApparentTemperatureGroup(hass, sensors)
+        group.unsubscribe = hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_START,
+            group.async_start,
+        )
+        return
+
     async_add_entities(
         [
             ApparentTemperatureSensor(
                 config.get(CONF_UNIQUE_ID),
                 config.get(CONF_NAME),
                 expand_entity_ids(hass, config.get(CONF_SOURCE)),
+                **_throttle_options(config, {}),
             ),
         ],
     )
 
 
 class ApparentTemperatureSensor(SensorEntity):
-    """Apparent Temperature Sensor class."""
+    """Apparent Temperature Sensor class.
+
+    State is only written when the value (rounded to the display precision)
+    moves by more than the deadband, at most once per minimum interval, and
+    again whenever it has not been written for the maximum age.
+    """
 
     _attr_has_entity_name = True
     _attr_icon = "mdi:thermometer-lines"
@@ -114,6 +188,10 @@ class ApparentTemperatureSensor(SensorEntity):
         unique_id: str | None,
         name: str | None,
         sources: list[str],
+        *,
+        deadband: float = 0.0,
+        min_interval: timedelta = timedelta(),
+        max_age: timedelta | None = None,
     ) -> None:
         """Class initialization."""
         self._attr_unique_id = unique_id
@@ -122,12 +200,21 @@ class ApparentTemperatureSensor(SensorEntity):
         self._name = name
         self._sources = sources
 
+        self._deadband = deadband
+        self._min_interval = min_interval.total_seconds()
+        self._max_age = max_age.total_seconds() if max_age else None
+        self._written_value = None
+        self._written_at = None
+        self._pending_write = None
+        self._heartbeat = None
+
         self._temp = None
         self._humd = None
         self._wind = None
         self._temp_val = None
         self._humd_val = None
         self._wind_val = None
+        self._converters = {}
 
     @staticmethod
     def _compose_name(source_name: str) -> str:
@@ -209,9 +296,11 @@ class ApparentTemperatureSensor(SensorEntity):
 
         # pylint: disable=unused-argument
         @callback
-        def sensor_state_listener(event: Event) -> None:  # noqa: ARG001
+        def sensor_state_listener(event: Event) -> None:
             """Handle device state changes."""
-            self.async_schedule_update_ha_state(force_refresh=True)
+            if self._update_source(event.data["entity_id"], event.data["new_state"]):
+                self._calculate()
+                self._async_publish()
 
         # pylint: disable=unused-argument
         @callback
@@ -223,12 +312,84 @@ class ApparentTemperatureSensor(SensorEntity):
                 sensor_state_listener,
             )
 
-            self.async_schedule_update_ha_state(
-                force_refresh=True,
-            )  # Force first update
+            # Force first update
+            self._read_sources()
+            self._calculate()
+            self._async_write()
 
         self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_START, sensor_startup)
 
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel pending writes."""
+        for cancel in (self._pending_write, self._heartbeat):
+            if cancel is not None:
+                cancel()
+        self._pending_write = self._heartbeat = None
+
+    @callback
+    def _async_publish(self) -> None:
+        """Write state if it moved beyond the deadband, throttled to min_interval."""
+        value = self._rounded_value()
+        written = self._written_value
+        if self._written_at is not None and (
+            value == written
+            or (
+                value is not None
+                and written is not None
+                and abs(value - written) <= self._deadband
+            )
+        ):
+            return
+
+        if self._written_at is not None:
+            wait = self._written_at + self._min_interval - self.hass.loop.time()
+            if wait > 0:
+                if self._pending_write is None:
+                    self._pending_write = async_call_later(
+                        self.hass,
+                        wait,
+                        self._async_write_pending,
+                    )
+                return
+        self._async_write()
+
+    @callback
+    def _async_write_pending(self, now: datetime) -> None:  # noqa: ARG002
+        """Write a state deferred by min_interval, if it is still needed."""
+        self._pending_write = None
+        self._async_publish()
+
+    @callback
+    def _async_write_heartbeat(self, now: datetime) -> None:  # noqa: ARG002
+        """Write the current state because it reached max_age."""
+        self._heartbeat = None
+        self._async_write()
+
+    def _rounded_value(self) -> float | None:
+        """Return the value rounded to the display precision."""
+        if self._attr_native_value is None:
+            return None
+        return round(self._attr_native_value, self._attr_suggested_display_precision)
+
+    @callback
+    def _async_write(self) -> None:
+        """Write state and restart the max_age heartbeat."""
+        if self._pending_write is not None:
+            self._pending_write()
+            self._pending_write = None
+        if self._heartbeat is not None:
+            self._heartbeat()
+            self._heartbeat = None
+        self._written_value = self._rounded_value()
+        self._written_at = self.hass.loop.time()
+        self.async_write_ha_state()
+        if self._max_age is not None:
+            self._heartbeat = async_call_later(
+                self.hass,
+                self._max_age,
+                self._async_write_heartbeat,
+            )
+
     @staticmethod
     def _has_state(state: str | None) -> bool:
         """Return True if state has any value."""
@@ -239,11 +400,23 @@ class ApparentTemperatureSensor(SensorEntity):
             "",
         ]
 
-    def _get_temperature(self, entity_id: str | None) -> float | None:
-        """Get temperature value (in °C) from entity."""
-        if entity_id is None:
-            return None
-        state: State = self.hass.states.get(entity_id)
+    def _converter(
+        self,
+        entity_id: str,
+        converter: type[BaseUnitConverter],
+        from_unit: str | None,
+        to_unit: str,
+    ) -> Callable[[float], float]:
+        """Return the unit converter for a source, rebuilt only if its unit changes."""
+        key = (entity_id, converter.UNIT_CLASS)
+        cached = self._converters.get(key)
+        if cached is None or cached[0] != from_unit:
+            cached = (from_unit, converter.converter_factory(from_unit, to_unit))
+            self._converters[key] = cached
+        return cached[1]
+
+    def _read_temperature(self, state: State | None) -> float | None:
+        """Get temperature value (in °C) from a source state."""
         if state is None:
             return None
 
@@ -262,22 +435,20 @@ class ApparentTemperatureSensor(SensorEntity):
             return None
 
         try:
-            temperature = TemperatureConverter.convert(
-                float(temperature),
+            temperature = self._converter(
+                state.entity_id,
+                TemperatureConverter,
                 entity_unit,
                 UnitOfTemperature.CELSIUS,
-            )
+            )(float(temperature))
         except ValueError:
             _LOGGER.exception('Could not convert value "%s" to float', state)
             return None
 
         return float(temperature)
 
-    def _get_humidity(self, entity_id: str | None) -> float | None:
-        """Get humidity value from entity."""
-        if entity_id is None:
-            return None
-        state: State = self.hass.states.get(entity_id)
+    def _read_humidity(self, state: State | None) -> float | None:
+        """Get humidity value from a source state."""
         if state is None:
             return None
 
@@ -294,11 +465,8 @@ class ApparentTemperatureSensor(SensorEntity):
 
         return float(humidity)
 
-    def _get_wind_speed(self, entity_id: str | None) -> float | None:
-        """Get wind speed value from entity."""
-        if entity_id is None:
-            return 0.0
-        state: State = self.hass.states.get(entity_id)
+    def _read_wind_speed(self, state: State | None) -> float | None:
+        """Get wind speed value (in m/s) from a source state."""
         if state is None:
             return 0.0
 
@@ -314,22 +482,50 @@ class ApparentTemperatureSensor(SensorEntity):
             return None
 
         try:
-            wind_speed = SpeedConverter.convert(
-                float(wind_speed),
+            wind_speed = self._converter(
+                state.entity_id,
+                SpeedConverter,
                 entity_unit,
                 UnitOfSpeed.METERS_PER_SECOND,
-            )
+            )(float(wind_speed))
         except ValueError:
             _LOGGER.exception('Could not convert value "%s" to float', state)
             return None
 
         return float(wind_speed)
 
+    def _read_sources(self) -> None:
+        """Read all source values from the state machine."""
+        states = self.hass.states
+        self._temp_val = self._read_temperature(states.get(self._temp or ""))
+        self._humd_val = self._read_humidity(states.get(self._humd or ""))
+        self._wind_val = self._read_wind_speed(states.get(self._wind or ""))
+
+    def _update_source(self, entity_id: str, state: State | None) -> bool:
+        """Update the values read from a changed source.
+
+        Return whether any value changed, so attribute-only changes of a source
+        skip recalculation.
+        """
+        inputs = (self._temp_val, self._humd_val, self._wind_val)
+        if entity_id == self._temp:
+            self._temp_val = self._read_temperature(state)
+        if entity_id == self._humd:
+            self._humd_val = self._read_humidity(state)
+        if entity_id == self._wind:
+            self._wind_val = self._read_wind_speed(state)
+        return inputs != (self._temp_val, self._humd_val, self._wind_val)
+
     async def async_update(self) -> None:
         """Update sensor state."""
-        self._temp_val = temp = self._get_temperature(self._temp)  # °C
-        self._humd_val = humd = self._get_humidity(self._humd)  # %
-        self._wind_val = wind = self._get_wind_speed(self._wind)  # m/s
+        self._read_sources()
+        self._calculate()
+
+    def _calculate(self) -> None:
+        """Calculate sensor value from the source values."""
+        temp = self._temp_val  # °C
+        humd = self._humd_val  # %
+        wind = self._wind_val  # m/s
 
         _LOGGER.debug("Temp: %s °C  Hum: %s %%  Wind: %s m/s", temp, humd, wind)
 
@@ -346,10 +542,132 @@ class ApparentTemperatureSensor(SensorEntity):
             )
             wind = 0
 
-        e_value = humd * 0.06105 * math.exp((17.27 * temp) / (237.7 + temp))
-        self._attr_native_value = temp + 0.33 * e_value - 0.7 * wind - 4
+        self._attr_native_value = float(apparent_temperature(temp, humd, wind))
         _LOGGER.debug(
             "New sensor state is %s %s",
             self._attr_native_value,
             self._attr_native_unit_of_measurement,
         )
+
+
+class GroupedApparentTemperatureSensor(ApparentTemperatureSensor):
+    """Apparent Temperature Sensor updated by an ApparentTemperatureGroup."""
+
+    group: "ApparentTemperatureGroup | None" = None
+
+    async def async_added_to_hass(self) -> None:
+        """Leave tracking sources to the group."""
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel pending writes and leave the group."""
+        await super().async_will_remove_from_hass()
+        if self.group is not None:
+            self.group.async_remove(self)
+            self.group = None
+
+    @property
+    def inputs(self) -> tuple[float | None, float | None, float | None]:
+        """Return the current source values (in °C, % and m/s)."""
+        return (self._temp_val, self._humd_val, self._wind_val)
+
+    @callback
+    def async_set_value(self, value: float | None) -> None:
+        """Set the value calculated by the group and write it if needed."""
+        self._attr_native_value = value
+        self._async_publish()
+
+
+class ApparentTemperatureGroup:
+    """Calculate apparent temperature for many sensors in one pass.
+
+    A single state listener tracks the sources of every sensor. A change only
+    re-reads the changed source for the sensors using it, and when any of their
+    values changed all values are calculated together, leaving each sensor to
+    decide whether its new value is worth writing.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        sensors: list[GroupedApparentTemperatureSensor],
+    ) -> None:
+        """Class initialization."""
+        self.hass = hass
+        self.sensors = sensors
+        self.sources: dict[str, list[GroupedApparentTemperatureSensor]] = {}
+        self.unavailable: set[GroupedApparentTemperatureSensor] = set()
+        self.unsubscribe: CALLBACK_TYPE | None = None
+        for sensor in sensors:
+            sensor.group = self
+
+    @callback
+    def async_start(self, event: Event | None = None) -> None:  # noqa: ARG002
+        """Track the sources of every sensor and calculate initial values."""
+        for sensor in self.sensors:
+            for entity_id in sensor._setup_sources():  # noqa: SLF001
+                self.sources.setdefault(entity_id, []).append(sensor)
+            sensor._read_sources()  # noqa: SLF001
+        self.unsubscribe = async_track_state_change_event(
+            self.hass,
+            sorted(self.sources),
+            self._async_sources_changed,
+        )
+        self.async_update()
+
+    @callback
+    def async_remove(self, sensor: GroupedApparentTemperatureSensor) -> None:
+        """Stop updating a removed sensor, and stop tracking once none are left."""
+        self.sensors.remove(sensor)
+        self.unavailable.discard(sensor)
+        for sensors in self.sources.values():
+            if sensor in sensors:
+                sensors.remove(sensor)
+        if not self.sensors and self.unsubscribe is not None:
+            self.unsubscribe()
+            self.unsubscribe = None
+
+    @callback
+    def _async_sources_changed(self, event: Event) -> None:
+        """Handle source state changes."""
+        entity_id = event.data["entity_id"]
+        new_state = event.data["new_state"]
+        changed = False
+        for sensor in self.sources.get(entity_id, ()):
+            changed = sensor._update_source(entity_id, new_state) or changed  # noqa: SLF001
+        if changed:
+            self.async_update()
+
+    @callback
+    def async_update(self) -> None:
+        """Calculate all sensor values and write those that changed."""
+        inputs = [sensor.inputs for sensor in self.sensors]
+        values = np.array(inputs, dtype=float).reshape(-1, 3)
+        unavailable = np.isnan(values[:, :2]).any(axis=1)
+        now_unavailable = {
+            sensor
+            for sensor, skip in zip(self.sensors, unavailable, strict=True)
+            if skip
+        }
+        if newly_unavailable := now_unavailable - self.unavailable:
+            _LOGGER.warning(
+                "Can't calculate %s: some sources are unavailable.",
+                ", ".join(
+                    str(sensor.name)
+                    for sensor in self.sensors
+                    if sensor in newly_unavailable
+                ),
+            )
+        self.unavailable = now_unavailable
+        apparent = apparent_temperature(
+            values[:, 0],
+            values[:, 1],
+            np.nan_to_num(values[:, 2]),
+        )
+
+        for sensor, skip, value in zip(
+            self.sensors,
+            unavailable.tolist(),
+            apparent.tolist(),
+            strict=True,
+        ):
+            sensor.async_set_value(None if skip else value)